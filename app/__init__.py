@@ -2,14 +2,33 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_restx import Api
-from flask_jwt_extended import JWTManager
 import os
 from dotenv import load_dotenv
 import secrets 
 
-db = SQLAlchemy()
+from app.utils.cache import Cache
+from app.utils.compression import Compression
+from app.utils.db_pool import engine_options, instrument_engine
+from app.utils.db_routing import RoutingSession, init_replica_routing
+from app.utils.instrumentation import init_request_instrumentation, instrument_queries
+from app.utils.json_encoder import check_json_encoder, output_json
+from app.utils.jwt_cache import CachingJWTManager
+from app.utils.login_tracker import LoginTracker
+from app.utils.metrics import Metrics
+from app.utils.password_hasher import PasswordHasher
+from app.utils.token_blocklist import TokenBlocklist
+
+# Objects keep their loaded state after commit, so writes don't need a SELECT to read them back;
+# RoutingSession sends @replica_read repository methods to the "replica" bind when configured
+db = SQLAlchemy(session_options={'expire_on_commit': False, 'class_': RoutingSession})
 migrate = Migrate()
-jwt = JWTManager()
+jwt = CachingJWTManager()
+cache = Cache()
+metrics = Metrics()
+compression = Compression()
+password_hasher = PasswordHasher()
+login_tracker = LoginTracker()
+token_blocklist = TokenBlocklist()
 
 api = Api(
     title="Online Library API", 
@@ -25,6 +44,7 @@ api = Api(
         }
     }
 )
+api.representation('application/json')(output_json)
 
 
 def create_app(config_object=None) -> Flask:
@@ -43,10 +63,32 @@ def create_app(config_object=None) -> Flask:
             JWT_REFRESH_TOKEN_EXPIRES=False
         )
 
+    check_json_encoder(app)
+    pool_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'], pool_options, app.config
+    )
+    # Binds such as the read replica get the same pool settings
+    app.config['SQLALCHEMY_BINDS'] = {
+        key: {'url': url, **engine_options(url, pool_options, app.config)} if isinstance(url, str) else url
+        for key, url in app.config.get('SQLALCHEMY_BINDS', {}).items()
+    }
     db.init_app(app)
+    init_replica_routing(app)
+    metrics.init_app(app)
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            instrument_engine(engine, metrics.registry, bind or 'default')
+            instrument_queries(engine, metrics.registry, bind or 'default')
+        init_request_instrumentation(app, metrics.registry)
+    compression.init_app(app)
     migrate.init_app(app, db)
     api.init_app(app)
     jwt.init_app(app)
+    cache.init_app(app)
+    password_hasher.init_app(app)
+    login_tracker.init_app(app)
+    token_blocklist.init_app(app)
 
     
     # JWT Error Handlers
@@ -69,6 +111,10 @@ def create_app(config_object=None) -> Flask:
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
         return {'error': 'Token has been revoked'}, 401
+    
+    @jwt.token_in_blocklist_loader
+    def token_in_blocklist_callback(jwt_header, jwt_payload):
+        return token_blocklist.is_revoked(jwt_payload)
 
     from app.controllers import (
         book_controller, 
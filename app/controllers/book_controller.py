@@ -1,13 +1,24 @@
-from flask import request
+import csv
+import io
+import json
+from itertools import islice
+
+from flask import request, current_app, Response, stream_with_context
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required
-from typing import Dict, Any
+from marshmallow import ValidationError as MarshmallowValidationError
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from datetime import date
 
 from flask import Blueprint
 
 from app.services.book_service import book_service
-from app.schemas.book_schemas import BookCreateSchema, BookUpdateSchema, BookResponseSchema
+from app.schemas.book_schemas import (
+    BookCreateSchema, BookUpdateSchema, BookResponseSchema, BookReserveSchema, BookReserveBatchSchema
+)
+from app.schemas.row_serializers import book_serializer, BOOK_FIELDS
+from app.utils.conditional import book_etag, listing_etag, not_modified, validator_headers
+from app.utils.json_encoder import dumps
 
 # Create namespace for Swagger documentation
 book_ns = Namespace('books', description='Book operations')
@@ -53,6 +64,8 @@ book_model = book_ns.model(
         "category": fields.String(required=True),
         "stock": fields.Integer,
         "creator": fields.String,
+        "created_at": fields.DateTime(readOnly=True),
+        "updated_at": fields.DateTime(readOnly=True),
     },
 )
 
@@ -67,6 +80,8 @@ pagination_model = book_ns.model(
         "has_prev": fields.Boolean,
         "next_num": fields.Integer,
         "prev_num": fields.Integer,
+        "next_cursor": fields.String(description="Opaque token for the next page in cursor mode"),
+        "total_approximate": fields.Boolean(description="Whether total is an estimate from table statistics"),
     },
 )
 
@@ -77,11 +92,229 @@ book_list_model = book_ns.model(
         "pagination": fields.Nested(pagination_model),
     },
 )
+book_batch_model = book_ns.model(
+    "BookBatch",
+    {
+        "books": fields.Nested(book_model, many=True, description="Books in the order of ids"),
+        "missing": fields.List(fields.Integer, description="Requested ids with no book"),
+    },
+)
+
+book_bulk_error_model = book_ns.model(
+    "BookBulkError",
+    {
+        "index": fields.Integer(description="Position of the rejected book in the request"),
+        "errors": fields.Raw(description="Validation or database errors for that book"),
+    },
+)
+
+book_bulk_result_model = book_ns.model(
+    "BookBulkResult",
+    {
+        "created": fields.Integer,
+        "failed": fields.Integer,
+        "errors": fields.List(fields.Nested(book_bulk_error_model)),
+    },
+)
+
+book_reserve_model = book_ns.model(
+    "BookReserve",
+    {
+        "quantity": fields.Integer(default=1, min=1),
+    },
+)
+
+book_reserve_item_model = book_ns.model(
+    "BookReserveItem",
+    {
+        "book_id": fields.Integer(required=True),
+        "quantity": fields.Integer(default=1, min=1),
+    },
+)
+
+book_reserve_batch_model = book_ns.model(
+    "BookReserveBatch",
+    {
+        "items": fields.List(fields.Nested(book_reserve_item_model), required=True),
+        "all_or_nothing": fields.Boolean(default=False, description="Reserve every item or none of them"),
+    },
+)
+
+book_reservation_model = book_ns.model(
+    "BookReservation",
+    {
+        "book_id": fields.Integer,
+        "quantity": fields.Integer,
+        "reserved": fields.Boolean,
+        "stock": fields.Integer(description="Stock left after the reservation, or the current stock if it failed"),
+        "error": fields.String,
+    },
+)
+
+book_reservation_batch_model = book_ns.model(
+    "BookReservationBatch",
+    {
+        "reserved": fields.Integer,
+        "failed": fields.Integer,
+        "results": fields.List(fields.Nested(book_reservation_model)),
+    },
+)
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _filter_args() -> Dict[str, Any]:
+    """Read the book listing filters from the query string"""
+    release_date = request.args.get('release_date', type=str)
+    try:
+        if release_date:
+            release_date = date.fromisoformat(release_date)
+    except ValueError:
+        release_date = None
+
+    return {
+        'author': request.args.get('author', type=str),
+        'category': request.args.get('category', type=str),
+        'search': request.args.get('search', type=str),
+        'price': request.args.get('price', type=float),
+        'release_date': release_date,
+    }
+
+
+def _ids_arg() -> Optional[List[int]]:
+    """Read the comma-separated `ids=` from the query string"""
+    value = request.args.get('ids', type=str)
+    if value is None:
+        return None
+    try:
+        return [int(book_id) for book_id in value.split(',') if book_id.strip()]
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers")
+
+
+def _bool_arg(name: str) -> bool:
+    return request.args.get(name, 'false').lower() in ('1', 'true', 'yes')
+
+
+def _fields_arg() -> Optional[Tuple[str, ...]]:
+    """Read the `fields=` projection from the query string; id is always included"""
+    value = request.args.get('fields', type=str)
+    if not value:
+        return None
+
+    requested = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in requested if name not in BOOK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Expected any of: {', '.join(BOOK_FIELDS)}")
+    return tuple(dict.fromkeys(['id'] + requested))
+
+
+def _dump_books(books: Iterable[Any], fields: Optional[Tuple[str, ...]] = None) -> List[dict]:
+    """
+    Serialize books with the precompiled serializer, or the Marshmallow schema if BOOK_SERIALIZER = 'schema'.
+    Projected rows (`fields`) always use the precompiled serializer.
+    """
+    if fields:
+        return book_serializer(fields).dump_many(books)
+    if current_app.config.get('BOOK_SERIALIZER', 'fast') == 'schema':
+        return book_response_schema.dump(books, many=True)
+    return book_serializer().dump_many(books)
+
+
+def _dump_book(book: Any) -> dict:
+    if current_app.config.get('BOOK_SERIALIZER', 'fast') == 'schema':
+        return book_response_schema.dump(book)
+    return book_serializer().dump(book)
+
+
+def _export_chunks(export_format: str, columns: List[str], rows: Iterable[tuple], rows_per_chunk: int = 500) -> Iterator[str]:
+    """Encode rows as NDJSON or CSV, yielding a chunk of text every `rows_per_chunk` rows"""
+    buffer = io.StringIO()
+    writer = None
+    if export_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    serializer = book_serializer(tuple(columns))
+
+    for count, row in enumerate(rows, start=1):
+        if writer:
+            # Dates and timestamps in ISO 8601, as in the NDJSON export
+            writer.writerow(serializer.dump_row(row).values())
+        else:
+            buffer.write(dumps(serializer.dump_row(row)))
+            buffer.write('\n')
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+book_response_schema = BookResponseSchema()
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def _dump_reservation(reservation) -> dict:
+    error = None
+    if not reservation.reserved:
+        if reservation.stock is None:
+            error = 'Book not found'
+        elif reservation.stock < reservation.quantity:
+            error = 'Insufficient stock'
+        else:
+            error = 'Not reserved because another item failed'
+    return {**reservation._asdict(), 'error': error}
+
+
+def _ndjson_records(stream) -> Iterator[Any]:
+    """Decode an NDJSON body line by line; lines that are not JSON are passed through raw so validation rejects them"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line.decode('utf-8', errors='replace')
+
+
+def _chunks(records: Iterable[Any], size: int) -> Iterator[Tuple[int, List[Any]]]:
+    records = iter(records)
+    offset = 0
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield offset, chunk
+        offset += len(chunk)
+
+
+def _validate_books(chunk: List[Any]) -> Tuple[List[Tuple[int, dict]], List[Tuple[int, dict]]]:
+    """Validate a chunk with BookCreateSchema, returning ([(index, data)], [(index, messages)])"""
+    try:
+        return list(enumerate(BookCreateSchema(many=True).load(chunk))), []
+    except MarshmallowValidationError:
+        # Schema-level validators are skipped for the whole collection as soon as
+        # one row has field errors, so re-validate row by row for accurate results
+        schema = BookCreateSchema()
+        valid, invalid = [], []
+        for index, record in enumerate(chunk):
+            try:
+                valid.append((index, schema.load(record)))
+            except MarshmallowValidationError as e:
+                invalid.append((index, e.messages))
+        return valid, invalid
+
+
 @book_ns.route('')
 class BookList(Resource):
     @book_ns.doc('create_book')  # Documents this endpoint in Swagger UI with the name 'create_book'
     @book_ns.expect(book_create_model)  # Specifies that this endpoint expects a request body matching book_create_model
-    @book_ns.marshal_with(book_model, code=201)  # Serializes the response using book_model and sets 201 status code
+    @book_ns.response(201, 'Book created', book_model)  # Documents the 201 response body using book_model
     @book_ns.response(400, 'Validation Error')  # Documents that this endpoint may return a 400 error
     @book_ns.response(401, 'Authentication required')  # Documents that this endpoint requires authentication
     @book_ns.response(500, 'Internal Server Error')  # Documents that this endpoint may return a 500 error
@@ -96,14 +329,17 @@ class BookList(Resource):
             validated_data = schema.load(data)
             
             book = book_service.create_book(validated_data)
-            return BookResponseSchema().dump(book), 201
+            return _dump_book(book), 201, validator_headers(book_etag(book), book.updated_at)
         except ValueError as e:
             return {'error': str(e)}, 400
         except Exception as e:
             return {'error': 'Failed to create book'}, 500
 
     @book_ns.doc('list_books')  # Documents this endpoint in Swagger UI with the name 'list_books'
-    @book_ns.marshal_with(book_list_model)  # Serializes the response using book_list_model
+    @book_ns.response(200, 'Success', book_list_model)  # Documents the response body using book_list_model
+    @book_ns.response(200, 'Success with ids=', book_batch_model)
+    @book_ns.response(304, 'Not modified since the ETag in If-None-Match')
+    @book_ns.response(400, 'Invalid cursor, sort or fields parameters')  # Documents that invalid parameters return a 400 error
     @book_ns.response(401, 'Authentication required')  # Documents that this endpoint requires authentication
     @book_ns.response(500, 'Internal Server Error')  # Documents that this endpoint may return a 500 error
     @book_ns.expect(book_ns.parser()
@@ -111,9 +347,17 @@ class BookList(Resource):
         .add_argument('per_page', type=int, default=10, help='Items per page (max 100)')
         .add_argument('author', type=str, help='Filter by author name')
         .add_argument('category', type=str, help='Filter by category name')
-        .add_argument('search', type=str, help='Search books by title')
+        .add_argument('search', type=str, help='Words that title, description, author or category words must all start with; stopwords such as "the" are ignored')
         .add_argument('price', type=float, help='Filter by price')
-        .add_argument('release_date', type=date, help='Filter by release date'))
+        .add_argument('release_date', type=date, help='Filter by release date')
+        .add_argument('pagination', type=str, default='offset', help='Pagination mode: offset or cursor')
+        .add_argument('cursor', type=str, help='Cursor from a previous next_cursor (implies cursor mode)')
+        .add_argument('sort', type=str, default='id', help='Cursor mode sort field: id, title, author or category')
+        .add_argument('order', type=str, default='asc', help='Cursor mode sort order: asc or desc')
+        .add_argument('include_total', type=bool, default=False, help='Count matching books in cursor mode')
+        .add_argument('approximate', type=bool, default=False, help='Allow an estimated total from table statistics for unfiltered listings')
+        .add_argument('fields', type=str, help='Comma-separated book fields to return, e.g. id,title,price (id is always included)')
+        .add_argument('ids', type=str, help='Comma-separated book ids to fetch at once, e.g. 1,2,3; filters and pagination are ignored'))
     @jwt_required()
     def get(self):
         """List books with optional filtering and pagination"""
@@ -121,36 +365,64 @@ class BookList(Resource):
             # Extract query parameters
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 10, type=int)
-            author = request.args.get('author', type=str)
-            category = request.args.get('category', type=str)
-            search = request.args.get('search', type=str)
-            price = request.args.get('price', type=float)
-            release_date = request.args.get('release_date', type=str)
-            
-            try:
-                if release_date:
-                    release_date = date.fromisoformat(release_date)
-            except ValueError:
-                release_date = None
+            filters = _filter_args()
+            fields = _fields_arg()
+            approximate = _bool_arg('approximate')
+            ids = _ids_arg()
 
             # Validate pagination parameters
             if page < 1:
                 page = 1
             if per_page < 1 or per_page > 100:
                 per_page = 10
-                
+
+            # Any write bumps the catalogue version, so an unchanged one means an unchanged page
+            etag = listing_etag(book_service.catalogue_version())
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+
+            if ids is not None:
+                books, missing = book_service.get_books_by_ids(ids)
+                return {'books': _dump_books(books, fields), 'missing': missing}, 200, validator_headers(etag)
+
+            cursor = request.args.get('cursor', type=str)
+            if cursor is not None or request.args.get('pagination') == 'cursor':
+                books, next_cursor, total, total_approximate = book_service.get_books_by_cursor(
+                    per_page=per_page,
+                    cursor=cursor,
+                    sort=request.args.get('sort', 'id', type=str),
+                    order=request.args.get('order', 'asc', type=str),
+                    include_total=_bool_arg('include_total'),
+                    approximate=approximate,
+                    fields=fields,
+                    **filters
+                )
+                return {
+                    'books': _dump_books(books, fields),
+                    'pagination': {
+                        'page': None,
+                        'per_page': per_page,
+                        'total': total,
+                        'pages': None,
+                        'has_next': next_cursor is not None,
+                        'has_prev': None,
+                        'next_num': None,
+                        'prev_num': None,
+                        'next_cursor': next_cursor,
+                        'total_approximate': total_approximate,
+                    }
+                }, 200, validator_headers(etag)
+
             books, total = book_service.get_books_paginated(
                 page=page,
                 per_page=per_page,
-                author=author,
-                category=category,
-                search=search,
-                price=price,
-                release_date=release_date
+                fields=fields,
+                approximate=approximate,
+                **filters
             )
-            schema = BookResponseSchema(many=True)
             return {
-                'books': schema.dump(books),
+                'books': _dump_books(books, fields),
                 'pagination': {
                     'page': books.page,
                     'per_page': books.per_page,
@@ -160,18 +432,120 @@ class BookList(Resource):
                     'has_prev': books.has_prev,
                     'next_num': books.next_num,
                     'prev_num': books.prev_num,
+                    'next_cursor': None,
+                    'total_approximate': books.total_approximate,
                 }
-            }
+            }, 200, validator_headers(etag)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         except Exception as e:
-            print(f"Error in {book_ns.name} namespace:", e)
+            current_app.logger.exception("Failed to retrieve books")
             return {'error': 'Failed to retrieve books'}, 500
 
 
+@book_ns.route('/export')
+class BookExport(Resource):
+    @book_ns.doc('export_books')
+    @book_ns.response(200, 'Streamed catalogue export')
+    @book_ns.response(400, 'Unsupported export format')
+    @book_ns.response(401, 'Authentication required')
+    @book_ns.expect(book_ns.parser()
+        .add_argument('format', type=str, default='ndjson', help='Export format: ndjson or csv')
+        .add_argument('author', type=str, help='Filter by author name')
+        .add_argument('category', type=str, help='Filter by category name')
+        .add_argument('search', type=str, help='Words that title, description, author or category words must all start with; stopwords such as "the" are ignored')
+        .add_argument('price', type=float, help='Filter by price')
+        .add_argument('release_date', type=date, help='Filter by release date'))
+    @jwt_required()
+    def get(self):
+        """Stream every matching book as NDJSON or CSV with constant memory"""
+        export_format = request.args.get('format', 'ndjson', type=str)
+        if export_format not in EXPORT_FORMATS:
+            return {'error': f"Unsupported format, expected one of: {', '.join(EXPORT_FORMATS)}"}, 400
+
+        columns, rows = book_service.export_books(**_filter_args())
+        response = Response(
+            stream_with_context(_export_chunks(export_format, columns, rows)),
+            mimetype=EXPORT_FORMATS[export_format]
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename="books.{export_format}"'
+        return response
+
+
+@book_ns.route('/bulk')
+class BookBulkImport(Resource):
+    @book_ns.doc('bulk_import_books', description='Accepts a JSON array, or an NDJSON stream with Content-Type application/x-ndjson')
+    @book_ns.expect([book_create_model])
+    @book_ns.response(201, 'Books imported', book_bulk_result_model)
+    @book_ns.response(400, 'Nothing imported')
+    @book_ns.response(401, 'Authentication required')
+    @book_ns.response(500, 'Internal Server Error')
+    @jwt_required()
+    def post(self):
+        """Import many books at once, reporting per-row errors without aborting the batch"""
+        try:
+            if request.mimetype in NDJSON_MIMETYPES:
+                records = _ndjson_records(request.stream)
+            else:
+                records = request.get_json(silent=True)
+                if not isinstance(records, list):
+                    return {'error': 'Expected a JSON array of books'}, 400
+
+            chunk_size = current_app.config.get('BOOK_BULK_CHUNK_SIZE', 1000)
+            created, errors = 0, []
+            for offset, chunk in _chunks(records, chunk_size):
+                valid, invalid = _validate_books(chunk)
+                errors.extend({'index': offset + index, 'errors': messages} for index, messages in invalid)
+
+                failed = book_service.bulk_create_books([data for _, data in valid])
+                errors.extend(
+                    {'index': offset + valid[position][0], 'errors': {'_schema': [message]}}
+                    for position, message in failed
+                )
+                created += len(valid) - len(failed)
+
+            errors.sort(key=lambda error: error['index'])
+            return {'created': created, 'failed': len(errors), 'errors': errors}, 201 if created else 400
+        except Exception as e:
+            return {'error': 'Failed to import books'}, 500
+
+
+@book_ns.route('/reserve')
+class BookBatchReserve(Resource):
+    @book_ns.doc('reserve_books')
+    @book_ns.expect(book_reserve_batch_model)
+    @book_ns.response(200, 'At least one item reserved', book_reservation_batch_model)
+    @book_ns.response(400, 'Validation Error')
+    @book_ns.response(401, 'Authentication required')
+    @book_ns.response(409, 'Nothing reserved', book_reservation_batch_model)
+    @book_ns.response(500, 'Internal Server Error')
+    @jwt_required()
+    def post(self):
+        """Reserve stock of several books, reporting per item whether it was reserved"""
+        try:
+            data = BookReserveBatchSchema().load(request.get_json(silent=True) or {})
+            reservations = book_service.reserve_stock(
+                [(item['book_id'], item['quantity']) for item in data['items']],
+                all_or_nothing=data['all_or_nothing']
+            )
+            results = [_dump_reservation(reservation) for reservation in reservations]
+            reserved = sum(result['reserved'] for result in results)
+            return {'reserved': reserved, 'failed': len(results) - reserved, 'results': results}, 200 if reserved else 409
+        except MarshmallowValidationError as e:
+            return {'error': e.messages}, 400
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        except Exception as e:
+            current_app.logger.exception("Failed to reserve books")
+            return {'error': 'Failed to reserve books'}, 500
+
+
 @book_ns.route('/<int:book_id>')
 @book_ns.param('book_id', 'The book identifier', type=int)
 class Book(Resource):
     @book_ns.doc('get_book')  # Documents this endpoint in Swagger UI with the name 'get_book'
-    @book_ns.marshal_with(book_model)  # Serializes the response using book_model
+    @book_ns.response(200, 'Success', book_model)  # Documents the response body using book_model
+    @book_ns.response(304, 'Not modified since the ETag in If-None-Match or the If-Modified-Since date')
     @book_ns.response(401, 'Authentication required')  # Documents that this endpoint requires authentication
     @book_ns.response(404, 'Book not found')  # Documents that this endpoint may return a 404 error
     @book_ns.response(500, 'Internal Server Error')  # Documents that this endpoint may return a 500 error
@@ -182,13 +556,17 @@ class Book(Resource):
             book = book_service.get_book_by_id(book_id)
             if not book:
                 return {'error': 'Book not found'}, 404
-            return BookResponseSchema().dump(book)
+            etag = book_etag(book)
+            unchanged = not_modified(etag, book.updated_at)
+            if unchanged:
+                return unchanged
+            return _dump_book(book), 200, validator_headers(etag, book.updated_at)
         except Exception as e:
             return {'error': 'Failed to retrieve book'}, 500
 
     @book_ns.doc('update_book')  # Documents this endpoint in Swagger UI with the name 'update_book'
     @book_ns.expect(book_update_model)  # Specifies that this endpoint expects a request body matching book_update_model
-    @book_ns.marshal_with(book_model)  # Serializes the response using book_model
+    @book_ns.response(200, 'Success', book_model)  # Documents the response body using book_model
     @book_ns.response(400, 'Validation Error')  # Documents that this endpoint may return a 400 error
     @book_ns.response(401, 'Authentication required')  # Documents that this endpoint requires authentication
     @book_ns.response(404, 'Book not found')  # Documents that this endpoint may return a 404 error
@@ -205,9 +583,38 @@ class Book(Resource):
             book = book_service.update_book(book_id, validated_data)
             if not book:
                 return {'error': 'Book not found'}, 404
-            schema = BookResponseSchema()
-            return schema.dump(book)
+            return _dump_book(book), 200, validator_headers(book_etag(book), book.updated_at)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        except Exception as e:
+            return {'error': 'Failed to update book'}, 500
+
+
+@book_ns.route('/<int:book_id>/reserve')
+@book_ns.param('book_id', 'The book identifier', type=int)
+class BookReserve(Resource):
+    @book_ns.doc('reserve_book')
+    @book_ns.expect(book_reserve_model)
+    @book_ns.response(200, 'Reserved', book_reservation_model)
+    @book_ns.response(400, 'Validation Error')
+    @book_ns.response(401, 'Authentication required')
+    @book_ns.response(404, 'Book not found', book_reservation_model)
+    @book_ns.response(409, 'Insufficient stock', book_reservation_model)
+    @book_ns.response(500, 'Internal Server Error')
+    @jwt_required()
+    def post(self, book_id):
+        """Take stock of a book in a single conditional UPDATE, failing instead of going below zero"""
+        try:
+            data = BookReserveSchema().load(request.get_json(silent=True) or {})
+            reservation, = book_service.reserve_stock([(book_id, data['quantity'])])
+            result = _dump_reservation(reservation)
+            if reservation.reserved:
+                return result, 200
+            return result, 404 if reservation.stock is None else 409
+        except MarshmallowValidationError as e:
+            return {'error': e.messages}, 400
         except ValueError as e:
             return {'error': str(e)}, 400
         except Exception as e:
-            return {'error': 'Failed to update book'}, 500
\ No newline at end of file
+            current_app.logger.exception("Failed to reserve book")
+            return {'error': 'Failed to reserve book'}, 500
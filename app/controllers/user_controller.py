@@ -1,6 +1,6 @@
 from flask import request
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, create_access_token
 from marshmallow import ValidationError as MarshmallowValidationError
 from app.services.user_service import UserService
 from app.schemas.user_schemas import (
@@ -10,7 +10,7 @@ from app.schemas.user_schemas import (
     UserUpdateSchema,
     TokenResponseSchema
 )
-from app.utils.exceptions import ValidationError, AuthenticationError, UserNotFoundError
+from app.utils.exceptions import ValidationError, AuthenticationError, UserNotFoundError, ServiceUnavailableError
 
 # Create namespace for Swagger documentation
 user_ns = Namespace('users', description='User authentication and management operations')
@@ -53,7 +53,8 @@ user_response_model = user_ns.model(
         "is_active": fields.Boolean(),
         "is_admin": fields.Boolean(),
         "created_at": fields.DateTime(),
-        "updated_at": fields.DateTime()
+        "updated_at": fields.DateTime(),
+        "last_login_at": fields.DateTime()
     }
 )
 
@@ -74,6 +75,13 @@ password_change_model = user_ns.model(
     }
 )
 
+logout_model = user_ns.model(
+    "Logout",
+    {
+        "refresh_token": fields.String(description="Refresh token to revoke along with the access token")
+    }
+)
+
 token_response_model = user_ns.model(
     "TokenResponse",
     {
@@ -91,6 +99,7 @@ class UserRegistration(Resource):
     @user_ns.marshal_with(token_response_model, code=201)
     @user_ns.response(400, 'Validation Error')
     @user_ns.response(500, 'Internal Server Error')
+    @user_ns.response(503, 'Too many authentication requests')
     def post(self):
         """Register a new user"""
         try:
@@ -117,6 +126,8 @@ class UserRegistration(Resource):
             user_ns.abort(400, 'Validation error', errors=e.messages)
         except ValidationError as e:
             user_ns.abort(400, str(e))
+        except ServiceUnavailableError as e:
+            user_ns.abort(503, str(e))
         except Exception as e:
             user_ns.abort(500, 'Internal server error')
 
@@ -128,6 +139,7 @@ class UserLogin(Resource):
     @user_ns.marshal_with(token_response_model)
     @user_ns.response(400, 'Validation Error')
     @user_ns.response(500, 'Internal Server Error')
+    @user_ns.response(503, 'Too many authentication requests')
     def post(self):
         """Login user"""
         try:
@@ -153,6 +165,8 @@ class UserLogin(Resource):
             user_ns.abort(400, 'Validation error', errors=e.messages)
         except AuthenticationError as e:
             user_ns.abort(401, str(e))
+        except ServiceUnavailableError as e:
+            user_ns.abort(503, str(e))
         except Exception as e:
             user_ns.abort(500, 'Internal server error')
 
@@ -168,7 +182,7 @@ class UserProfile(Resource):
         """Get current user profile"""
         try:
             current_user_id = get_jwt_identity()
-            user = user_service.get_user_by_id(current_user_id)
+            user = user_service.get_user_profile(current_user_id)
             
             if not user:
                 user_ns.abort(404, 'User not found')
@@ -221,6 +235,7 @@ class PasswordChange(Resource):
     @user_ns.response(401, 'Authentication Error')
     @user_ns.response(404, 'User not found')
     @user_ns.response(500, 'Internal Server Error')
+    @user_ns.response(503, 'Too many authentication requests')
     @jwt_required()
     def post(self):
         """Change user password"""
@@ -249,6 +264,8 @@ class PasswordChange(Resource):
             user_ns.abort(400, str(e))
         except UserNotFoundError as e:
             user_ns.abort(404, str(e))
+        except ServiceUnavailableError as e:
+            user_ns.abort(503, str(e))
         except Exception as e:
             user_ns.abort(500, 'Internal server error')
 
@@ -264,6 +281,8 @@ class TokenRefresh(Resource):
         """Refresh access token"""
         try:
             current_user_id = get_jwt_identity()
+            # Not the profile cache: a deactivation made in another process
+            # must stop new tokens right away
             user = user_service.get_user_by_id(current_user_id)
             
             if not user or not user.is_active:
@@ -287,9 +306,19 @@ class TokenRefresh(Resource):
 @user_ns.route('/logout')
 class UserLogout(Resource):
     @user_ns.doc('logout_user')
+    @user_ns.expect(logout_model)
     @user_ns.response(200, 'Logged out successfully')
+    @user_ns.response(401, 'Authentication Error')
     @user_ns.response(500, 'Internal Server Error')
     @jwt_required()
     def post(self):
-        """Logout user (client should discard tokens)"""
-        return {'message': 'Logged out successfully'}, 200
+        """Logout user, revoking the access token (and the refresh token, if given)"""
+        try:
+            data = request.get_json(silent=True) or {}
+            user_service.logout_user(get_jwt(), refresh_token=data.get('refresh_token'))
+            return {'message': 'Logged out successfully'}, 200
+            
+        except AuthenticationError as e:
+            user_ns.abort(401, str(e))
+        except Exception as e:
+            user_ns.abort(500, 'Internal server error')
@@ -1,8 +1,33 @@
-from datetime import date
+from datetime import date, datetime
+
+from sqlalchemy import DDL, event
 
 from app import db
 
 
+# SQLite full-text search: an external-content FTS5 table over the searchable
+# columns of `books`, kept in sync by triggers. MySQL uses a FULLTEXT index instead.
+BOOKS_FTS_TABLE = "books_fts"
+
+SQLITE_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {BOOKS_FTS_TABLE} USING fts5("
+    "title, description, author, category, "
+    "content='books', content_rowid='id', prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    f"INSERT INTO {BOOKS_FTS_TABLE}(rowid, title, description, author, category) "
+    "VALUES (new.id, new.title, new.description, new.author, new.category); END",
+    f"CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    f"INSERT INTO {BOOKS_FTS_TABLE}({BOOKS_FTS_TABLE}, rowid, title, description, author, category) "
+    "VALUES ('delete', old.id, old.title, old.description, old.author, old.category); END",
+    # Only changes to the indexed columns are re-indexed, not stock or version bumps
+    f"CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, description, author, category ON books BEGIN "
+    f"INSERT INTO {BOOKS_FTS_TABLE}({BOOKS_FTS_TABLE}, rowid, title, description, author, category) "
+    "VALUES ('delete', old.id, old.title, old.description, old.author, old.category); "
+    f"INSERT INTO {BOOKS_FTS_TABLE}(rowid, title, description, author, category) "
+    "VALUES (new.id, new.title, new.description, new.author, new.category); END",
+)
+
+
 class Book(db.Model):
     __tablename__ = "books"
     
@@ -14,6 +39,11 @@ class Book(db.Model):
         db.Index('idx_author_category', 'author', 'category'),
         # Price range queries
         db.Index('idx_price_date', 'price', 'release_date'),
+        # Full-text search (MySQL only, SQLite uses the books_fts table)
+        db.Index(
+            'ft_books_search', 'title', 'description', 'author', 'category',
+            mysql_prefix='FULLTEXT'
+        ).ddl_if(dialect=('mysql', 'mariadb')),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -25,6 +55,24 @@ class Book(db.Model):
     category = db.Column(db.String(100), nullable=False, index=True)
     stock = db.Column(db.Integer, nullable=False)
     creator = db.Column(db.String(120), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.now, onupdate=datetime.now, nullable=False
+    )
+    # Incremented on every change and used in ETags. The ORM bumps it on flush;
+    # UPDATE statements issued directly (BookRepository.update_by_id) bump it themselves.
+    row_version = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+
+    __mapper_args__ = {"version_id_col": row_version}
 
     def __repr__(self) -> str:
-        return f"<Book id={self.id} title={self.title!r}>"
\ No newline at end of file
+        return f"<Book id={self.id} title={self.title!r}>"
+
+
+for _statement in SQLITE_FTS_DDL:
+    event.listen(Book.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Book.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {BOOKS_FTS_TABLE}").execute_if(dialect="sqlite"),
+)
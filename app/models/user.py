@@ -1,8 +1,6 @@
 from datetime import datetime
 
-from werkzeug.security import check_password_hash, generate_password_hash
-
-from app import db
+from app import db, password_hasher
 
 
 class User(db.Model):
@@ -18,12 +16,17 @@ class User(db.Model):
     updated_at = db.Column(
         db.DateTime, default=datetime.now, onupdate=datetime.now, nullable=False
     )
+    # Written in batches by app.utils.login_tracker, so it can trail by LOGIN_FLUSH_INTERVAL
+    last_login_at = db.Column(db.DateTime, nullable=True)
 
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self) -> bool:
+        return password_hasher.needs_rehash(self.password_hash)
 
     def __repr__(self) -> str:
         return f"<User id={self.id} username={self.username!r}>"
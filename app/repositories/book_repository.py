@@ -1,42 +1,183 @@
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Any, Iterator, Sequence, Dict
 from datetime import date
 
+from sqlalchemy import Float, insert, select, text, tuple_, update
+from sqlalchemy.orm.attributes import set_committed_value
+
 from app import db
 from app.models.book import Book
+from app.repositories.book_search import get_book_search
+from app.utils.db_routing import replica_read
+
+
+# SQLite stores whole REAL values as integers and RETURNING hands them back as
+# such, where a SELECT would give floats
+FLOAT_COLUMNS = [column.key for column in Book.__table__.columns if isinstance(column.type, Float)]
+
+
+# Columns that can drive keyset pagination; each is NOT NULL and indexed so
+# that (column, id) gives a stable total ordering
+KEYSET_SORT_COLUMNS = {
+    'id': Book.id,
+    'title': Book.title,
+    'author': Book.author,
+    'category': Book.category,
+}
 
 
 class BookRepository:
     def add(self, book: Book) -> Book:
         db.session.add(book)
         db.session.commit()
-        db.session.refresh(book)
         return book
 
+    def add_many(self, rows: List[dict]) -> None:
+        """Insert book rows with a single executemany, all or nothing"""
+        try:
+            db.session.execute(insert(Book), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @replica_read
     def get_by_id(self, book_id: int) -> Optional[Book]:
         return db.session.get(Book, book_id)
 
+    @replica_read
+    def get_many(self, book_ids: Sequence[int]) -> List[Book]:
+        """
+        Books with the given ids, in no particular order, missing ids left out
+
+        Books already in the session's identity map are reused; the rest are
+        loaded with a single SELECT ... WHERE id IN (...).
+        """
+        books, missing = [], []
+        for book_id in book_ids:
+            book = db.session.identity_map.get(db.session.identity_key(Book, book_id))
+            if book is None:
+                missing.append(book_id)
+            else:
+                books.append(book)
+        if missing:
+            books.extend(db.session.scalars(select(Book).where(Book.id.in_(missing))))
+        return books
+
+    @replica_read
     def list_all(self) -> list[Book]:
         return Book.query.order_by(Book.id.asc()).all()
 
     def update(self, book: Book) -> Book:
         db.session.commit()
-        db.session.refresh(book)
         return book
 
+    def update_by_id(self, book_id: int, values: dict) -> Optional[Book]:
+        """
+        Update a book with a single UPDATE ... WHERE id = :id
+
+        Where the dialect supports UPDATE ... RETURNING the book is hydrated from
+        the returned row; otherwise it is read back once after the update.
+        Returns None if no book has that id. row_version is incremented here since
+        the ORM only maintains it for flushed changes.
+        """
+        if not values:
+            return self.get_by_id(book_id)
+
+        statement = update(Book).where(Book.id == book_id).values(row_version=Book.row_version + 1, **values)
+        try:
+            if db.session.get_bind(mapper=Book.__mapper__).dialect.update_returning:
+                book = db.session.execute(statement.returning(Book)).scalar_one_or_none()
+                if book is not None:
+                    self._coerce_floats(book)
+            else:
+                result = db.session.execute(statement)
+                book = db.session.get(Book, book_id, populate_existing=True) if result.rowcount else None
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return book
+
+    @staticmethod
+    def _coerce_floats(book: Book) -> None:
+        """Give a book hydrated from RETURNING the same types as one that was SELECTed"""
+        for key in FLOAT_COLUMNS:
+            value = getattr(book, key)
+            if isinstance(value, int):
+                set_committed_value(book, key, float(value))
+
+    def reserve_stock(
+        self,
+        items: Sequence[Tuple[int, int]],
+        all_or_nothing: bool = False
+    ) -> List[Tuple[bool, Optional[int]]]:
+        """
+        Take `quantity` off the stock of each (book_id, quantity) item without reading it first
+
+        Each item is one UPDATE books SET stock = stock - :quantity WHERE id = :id
+        AND stock >= :quantity, so concurrent reservations can neither lose
+        updates nor oversell. Rows are updated in id order to keep concurrent
+        batches from deadlocking; everything commits together, or nothing does
+        with `all_or_nothing` when an item fails.
+
+        Returns (reserved, stock) per item in request order. stock is what is
+        left after a reservation, the current stock after a failed one, and
+        None when the book does not exist.
+        """
+        returning = db.session.get_bind(mapper=Book.__mapper__).dialect.update_returning
+        reserved = [False] * len(items)
+        remaining: Dict[int, int] = {}
+        try:
+            for position in sorted(range(len(items)), key=lambda i: items[i][0]):
+                book_id, quantity = items[position]
+                statement = (
+                    update(Book)
+                    .where(Book.id == book_id, Book.stock >= quantity)
+                    .values(stock=Book.stock - quantity, row_version=Book.row_version + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                if returning:
+                    stock = db.session.execute(statement.returning(Book.stock)).scalar_one_or_none()
+                    reserved[position] = stock is not None
+                    if stock is not None:
+                        remaining[position] = stock
+                else:
+                    reserved[position] = db.session.execute(statement).rowcount > 0
+
+            if all_or_nothing and not all(reserved):
+                db.session.rollback()
+                reserved, remaining = [False] * len(items), {}
+
+            # Stock that RETURNING did not report: failed items, or every item without RETURNING
+            unknown = {items[i][0] for i in range(len(items)) if i not in remaining}
+            current = dict(
+                db.session.query(Book.id, Book.stock).filter(Book.id.in_(unknown)).all()
+            ) if unknown else {}
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return [
+            (reserved[i], remaining[i] if i in remaining else current.get(items[i][0]))
+            for i in range(len(items))
+        ]
+
     def delete(self, book: Book) -> None:
         db.session.delete(book)
         db.session.commit()
-    
-    def get_paginated(
+
+    def _project(self, query, columns: Sequence[str]):
+        return query.with_entities(*[getattr(Book, name) for name in columns])
+
+    def _filtered_query(
         self,
-        page: int = 1,
-        per_page: int = 10,
         author: Optional[str] = None,
         category: Optional[str] = None,
         price: Optional[float] = None,
         release_date: Optional[date] = None,
-        search: Optional[str] = None
-    ) -> Tuple[List[Book], int]:
+        search: Optional[str] = None,
+        ranked: bool = False
+    ):
         query = Book.query
         if author:
             query = query.filter(Book.author.ilike(f"%{author}%"))
@@ -47,19 +188,191 @@ class BookRepository:
         if release_date:
             query = query.filter(Book.release_date == release_date)
         if search:
-            query = query.filter(
-                Book.title.ilike(f"%{search}%") |
-                Book.description.ilike(f"%{search}%") |
-                Book.author.ilike(f"%{search}%") |
-                Book.category.ilike(f"%{search}%")
-            )
+            query = get_book_search().apply(query, search, ranked=ranked)
+        return query
+    
+    def _lookup_query(
+        self,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        search: Optional[str] = None
+    ):
+        """Exact author/category lookups, ordered to follow the index that serves them"""
+        query = Book.query
+        if author is not None:
+            query = query.filter(Book.author == author)
+        if category is not None:
+            query = query.filter(Book.category == category)
+        if search:
+            return get_book_search().apply(query, search, ranked=True)
+        if author is not None:
+            # idx_author_category yields (category, id) order for a single author
+            return query.order_by(Book.category.asc(), Book.id.asc())
+        return query.order_by(Book.id.asc())
+
+    def find(
+        self,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        search: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Book]:
+        query = self._lookup_query(author=author, category=category, search=search)
+        return query.offset(offset).limit(limit).all()
+
+    def stream(
+        self,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        search: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> Iterator[Book]:
+        query = self._lookup_query(author=author, category=category, search=search)
+        return iter(query.yield_per(batch_size))
+    
+    def stream_columns(
+        self,
+        columns: List[str],
+        batch_size: int = 1000,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        price: Optional[float] = None,
+        release_date: Optional[date] = None,
+        search: Optional[str] = None
+    ) -> Iterator[tuple]:
+        """Stream plain column tuples through a server-side cursor, without ORM hydration"""
+        query = self._filtered_query(
+            author=author,
+            category=category,
+            price=price,
+            release_date=release_date,
+            search=search
+        )
+        query = query.with_entities(*[getattr(Book, name) for name in columns]).order_by(Book.id.asc())
+        return iter(query.execution_options(stream_results=True).yield_per(batch_size))
+    
+    @replica_read
+    def get_paginated(
+        self,
+        page: int = 1,
+        per_page: int = 10,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        price: Optional[float] = None,
+        release_date: Optional[date] = None,
+        search: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+        count: bool = True
+    ) -> Tuple[List[Book], Optional[int]]:
+        """
+        Offset pagination; with `columns`, only those columns are selected and rows
+        are returned instead of books. The total is None when `count` is False.
+        """
+        query = self._filtered_query(
+            author=author,
+            category=category,
+            price=price,
+            release_date=release_date,
+            search=search,
+            ranked=True
+        )
+        if columns:
+            query = self._project(query, columns)
         response = query.paginate(
             page=page, 
             per_page=per_page, 
             error_out=False,
-            count=True
+            count=count
         )
         return response, response.total
 
+    @replica_read
+    def get_keyset_page(
+        self,
+        per_page: int = 10,
+        sort: str = 'id',
+        order: str = 'asc',
+        after: Optional[Tuple[Any, int]] = None,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        price: Optional[float] = None,
+        release_date: Optional[date] = None,
+        search: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Book], bool]:
+        """
+        Fetch the page of books that follows the `after` (sort value, id) position.
+
+        Seeks on the (sort column, id) index instead of using OFFSET, so every page
+        costs the same. Returns (books, has_next). With `columns`, rows with only
+        those columns (plus the sort column) are returned instead of books.
+        """
+        query = self._filtered_query(
+            author=author,
+            category=category,
+            price=price,
+            release_date=release_date,
+            search=search
+        )
+
+        column = KEYSET_SORT_COLUMNS[sort]
+        descending = order == 'desc'
+        keys = [Book.id] if column is Book.id else [column, Book.id]
 
+        if after is not None:
+            value, last_id = after
+            if column is Book.id:
+                key, bound = Book.id, last_id
+            else:
+                key, bound = tuple_(column, Book.id), tuple_(value, last_id)
+            query = query.filter(key < bound if descending else key > bound)
+
+        query = query.order_by(*[key.desc() if descending else key.asc() for key in keys])
+        if columns:
+            query = self._project(query, list(columns) + [sort] * (sort not in columns))
+        books = query.limit(per_page + 1).all()
+        return books[:per_page], len(books) > per_page
+
+    @replica_read
+    def count(
+        self,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        price: Optional[float] = None,
+        release_date: Optional[date] = None,
+        search: Optional[str] = None
+    ) -> int:
+        query = self._filtered_query(
+            author=author,
+            category=category,
+            price=price,
+            release_date=release_date,
+            search=search
+        )
+        return query.order_by(None).count()
 
+    def estimate_count(self) -> Optional[int]:
+        """
+        Estimate the number of books from table statistics without scanning.
+        Returns None when the dialect has no statistics available.
+        """
+        dialect = db.session.get_bind(mapper=Book.__mapper__).dialect.name
+        if dialect in ('mysql', 'mariadb'):
+            return db.session.execute(text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+            ), {'table': Book.__tablename__}).scalar()
+        if dialect == 'sqlite':
+            # Only populated once ANALYZE has run; the first number is the row count
+            has_stats = db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )).scalar()
+            if has_stats:
+                stat = db.session.execute(
+                    text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"),
+                    {'table': Book.__tablename__}
+                ).scalar()
+                if stat:
+                    return int(stat.split()[0])
+        return None
@@ -0,0 +1,107 @@
+import re
+from typing import List
+
+from sqlalchemy import column, literal_column, table
+from sqlalchemy.dialects.mysql import match
+
+from app import db
+from app.models.book import Book, BOOKS_FTS_TABLE
+
+
+# InnoDB's default full-text stopwords. They are dropped on every backend so
+# that "the gatsby" means "gatsby" everywhere: MySQL never indexes them, and
+# requiring one there matches nothing
+STOPWORDS = frozenset({
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for", "from", "how", "i",
+    "in", "is", "it", "la", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when",
+    "where", "who", "will", "with", "und", "www",
+})
+
+
+def _search_terms(search: str, min_length: int = 1) -> List[str]:
+    """
+    Split a free-text search into the word tokens every match must start with
+
+    Query-syntax characters, stopwords and words shorter than `min_length` are
+    dropped. An empty result means there is nothing to match on the index.
+    """
+    return [
+        term for term in re.findall(r"\w+", search)
+        if len(term) >= min_length and term.lower() not in STOPWORDS
+    ]
+
+
+class LikeBookSearch:
+    """Portable search backend: substring ILIKE over the searchable columns, unranked"""
+
+    def apply(self, query, search: str, ranked: bool = False):
+        pattern = f"%{search}%"
+        return query.filter(
+            Book.title.ilike(pattern) |
+            Book.description.ilike(pattern) |
+            Book.author.ilike(pattern) |
+            Book.category.ilike(pattern)
+        )
+
+
+class SqliteFtsBookSearch(LikeBookSearch):
+    """
+    SQLite backend: prefix matching against the books_fts FTS5 table, ranked by bm25
+
+    Every term must start a word of the book ("gats" finds "Gatsby", "atsby"
+    does not). Searches made only of stopwords fall back to substring matching.
+    """
+
+    fts = table(BOOKS_FTS_TABLE, column("rowid"), column("rank"))
+
+    def apply(self, query, search: str, ranked: bool = False):
+        terms = _search_terms(search)
+        if not terms:
+            return super().apply(query, search, ranked)
+
+        expression = " ".join(f'"{term}"*' for term in terms)
+        query = query.join(self.fts, self.fts.c.rowid == Book.id).filter(
+            literal_column(BOOKS_FTS_TABLE).op("MATCH")(expression)
+        )
+        if ranked:
+            query = query.order_by(self.fts.c.rank, Book.id)
+        return query
+
+
+class MySqlFulltextBookSearch(LikeBookSearch):
+    """
+    MySQL backend: boolean-mode MATCH ... AGAINST on the ft_books_search index,
+    with the same prefix matching as SQLite
+
+    Words shorter than innodb_ft_min_token_size are not indexed, and requiring
+    one would match nothing, so they are left out of the query.
+    """
+
+    min_token_size = 3
+
+    def apply(self, query, search: str, ranked: bool = False):
+        terms = _search_terms(search, self.min_token_size)
+        if not terms:
+            return super().apply(query, search, ranked)
+
+        relevance = match(
+            Book.title, Book.description, Book.author, Book.category,
+            against=" ".join(f"+{term}*" for term in terms)
+        ).in_boolean_mode()
+        query = query.filter(relevance)
+        if ranked:
+            query = query.order_by(relevance.desc(), Book.id)
+        return query
+
+
+_BACKENDS = {
+    "sqlite": SqliteFtsBookSearch(),
+    "mysql": MySqlFulltextBookSearch(),
+    "mariadb": MySqlFulltextBookSearch(),
+}
+
+
+def get_book_search():
+    """Pick the search backend matching the dialect of the books table's engine"""
+    dialect = db.session.get_bind(mapper=Book.__mapper__).dialect.name
+    return _BACKENDS.get(dialect, LikeBookSearch())
@@ -1,31 +1,50 @@
 from typing import Optional
 
+from sqlalchemy import or_
+
 from app import db
 from app.models.user import User
+from app.utils.db_routing import replica_read
 
 
 class UserRepository:
     def add(self, user: User) -> User:
+        """Insert a user; a taken username or email surfaces as IntegrityError"""
         db.session.add(user)
-        db.session.commit()
-        db.session.refresh(user)
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
         return user
 
+    @replica_read
     def get_by_id(self, user_id: int) -> Optional[User]:
         return db.session.get(User, user_id)
 
+    @replica_read
     def get_by_username(self, username: str) -> Optional[User]:
         return User.query.filter_by(username=username).first()
 
+    @replica_read
     def get_by_email(self, email: str) -> Optional[User]:
         return User.query.filter_by(email=email).first()
 
+    @replica_read
+    def get_by_username_or_email(self, login: str) -> Optional[User]:
+        """Resolve a login in one query over both unique indexes, preferring a username match"""
+        users = User.query.filter(or_(User.username == login, User.email == login)).limit(2).all()
+        for user in users:
+            if user.username == login:
+                return user
+        return users[0] if users else None
+
+    @replica_read
     def list_all(self) -> list[User]:
         return User.query.order_by(User.id.asc()).all()
 
     def update(self, user: User) -> User:
         db.session.commit()
-        db.session.refresh(user)
         return user
 
     def delete(self, user: User) -> None:
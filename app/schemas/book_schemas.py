@@ -39,6 +39,22 @@ class BookUpdateSchema(Schema):
             raise ValidationError('Release date cannot be in the future', 'release_date')
 
 
+class BookReserveSchema(Schema):
+    """Schema for reserving stock of one book"""
+    quantity = fields.Int(load_default=1, validate=validate.Range(min=1))
+
+
+class BookReserveItemSchema(BookReserveSchema):
+    """Schema for one item of a batch reservation"""
+    book_id = fields.Int(required=True)
+
+
+class BookReserveBatchSchema(Schema):
+    """Schema for reserving stock of several books at once"""
+    items = fields.List(fields.Nested(BookReserveItemSchema), required=True, validate=validate.Length(min=1))
+    all_or_nothing = fields.Bool(load_default=False)
+
+
 class BookResponseSchema(Schema):
     """Schema for book response serialization"""
     id = fields.Int()
@@ -45,6 +45,7 @@ class UserResponseSchema(Schema):
     is_admin = fields.Bool()
     created_at = fields.DateTime()
     updated_at = fields.DateTime()
+    last_login_at = fields.DateTime()
 
 
 class UserUpdateSchema(Schema):
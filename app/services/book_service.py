@@ -1,7 +1,50 @@
-from typing import List, Tuple, Optional
+import hashlib
+import json
+import time
+from collections import namedtuple
+from functools import lru_cache
+from typing import List, Tuple, Optional, Iterator, Sequence
 from datetime import date
+
+from flask import current_app
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app import cache
 from app.models.book import Book
-from app.repositories.book_repository import BookRepository
+from app.repositories.book_repository import BookRepository, KEYSET_SORT_COLUMNS
+from app.utils.db_routing import use_primary
+from app.utils.pagination import encode_cursor, decode_cursor, Page
+
+# The fields of a book response, so exports carry what the API returns
+EXPORT_COLUMNS = [
+    'id', 'title', 'description', 'release_date', 'price', 'author', 'category', 'stock', 'creator',
+    'created_at', 'updated_at',
+]
+
+# Maintained by the database and the ORM, never taken from update payloads
+MANAGED_COLUMNS = ('id', 'created_at', 'updated_at', 'row_version')
+
+# Bumped on every write; listing cache keys embed it so a write invalidates every cached page
+CATALOGUE_VERSION_KEY = "books:version"
+
+
+def _to_row(book: Book) -> dict:
+    return {column.key: getattr(book, column.key) for column in Book.__table__.columns}
+
+
+def _from_row(row: dict) -> Book:
+    return Book(**row)
+
+
+# Outcome of reserving one item: stock is what is left, or the current stock if it was not
+# reserved, or None if the book does not exist
+Reservation = namedtuple('Reservation', ['book_id', 'quantity', 'reserved', 'stock'])
+
+
+@lru_cache(maxsize=64)
+def _projected_row_type(fields: Tuple[str, ...]):
+    """Named tuple type standing in for a projected result row rebuilt from the cache"""
+    return namedtuple('BookRow', fields)
 
 
 class BookService:
@@ -11,22 +54,95 @@ class BookService:
     def create_book(self, data: dict) -> Book:
         """Create a new book with validation"""
         # Create book instance
-        book = Book(
-            title=data['title'],
-            description=data.get('description'),
-            release_date=data.get('release_date'),
-            price=data.get('price'),
-            author=data['author'],
-            category=data['category'],
-            stock=data.get('stock', 0),
-            creator=data.get('creator', 'System')
-        )
+        book = Book(**self._book_values(data))
         
-        return self.book_repository.add(book)
+        book = self.book_repository.add(book)
+        self._invalidate_cache()
+        return book
+
+    def bulk_create_books(self, rows: List[dict]) -> List[Tuple[int, str]]:
+        """
+        Insert a batch of validated books in one round-trip
+
+        If the batch is rejected by the database, the rows are retried one at a
+        time so that only the offending ones fail.
+
+        Returns:
+            List of (position in rows, error message) for rows that were not inserted
+        """
+        if not rows:
+            return []
+
+        values = [self._book_values(data) for data in rows]
+        errors = []
+        try:
+            self.book_repository.add_many(values)
+        except Exception:
+            for position, row in enumerate(values):
+                try:
+                    self.book_repository.add_many([row])
+                except Exception as e:
+                    current_app.logger.warning("Bulk insert rejected row %d: %s", position, getattr(e, 'orig', e))
+                    errors.append((position, self._row_error_message(e)))
+
+        if len(errors) < len(rows):
+            self._invalidate_cache()
+        return errors
+
+    @staticmethod
+    def _row_error_message(error: Exception) -> str:
+        """What to tell the client about a rejected row, without the driver's message and SQL"""
+        if isinstance(error, IntegrityError):
+            return "Row violates a database constraint"
+        if isinstance(error, DataError):
+            return "Row has a value the database cannot store"
+        return "Row could not be inserted"
 
     def get_book_by_id(self, book_id: int) -> Optional[Book]:
-        """Get a book by ID"""
-        return self.book_repository.get_by_id(book_id)
+        """Get a book by ID, served from the cache when possible"""
+        ttl = self._cache_ttl()
+        if ttl:
+            row = cache.get(f"book:{book_id}")
+            if row is not None:
+                return _from_row(row)
+
+        book = self.book_repository.get_by_id(book_id)
+        if book and ttl:
+            cache.set(f"book:{book_id}", _to_row(book), ttl)
+        return book
+
+    def get_books_by_ids(self, book_ids: Sequence[int]) -> Tuple[List[Book], List[int]]:
+        """
+        Get many books by id, returning (books in request order, ids that do not exist)
+
+        Repeated ids are returned once. Cached books are used first and the rest
+        are loaded with one query.
+
+        Raises:
+            ValueError: If there are no ids or more than BOOK_BATCH_MAX_IDS
+        """
+        max_ids = current_app.config.get('BOOK_BATCH_MAX_IDS', 100)
+        book_ids = list(dict.fromkeys(book_ids))
+        if not book_ids:
+            raise ValueError("No book ids given")
+        if len(book_ids) > max_ids:
+            raise ValueError(f"At most {max_ids} books can be fetched at once")
+
+        found = {}
+        ttl = self._cache_ttl()
+        if ttl:
+            rows = cache.get_many([f"book:{book_id}" for book_id in book_ids])
+            found = {book_id: _from_row(row) for book_id, row in zip(book_ids, rows) if row is not None}
+
+        uncached = [book_id for book_id in book_ids if book_id not in found]
+        if uncached:
+            for book in self.book_repository.get_many(uncached):
+                found[book.id] = book
+                if ttl:
+                    cache.set(f"book:{book.id}", _to_row(book), ttl)
+
+        books = [found[book_id] for book_id in book_ids if book_id in found]
+        return books, [book_id for book_id in book_ids if book_id not in found]
 
     def get_books_paginated(
         self, 
@@ -36,68 +152,320 @@ class BookService:
         category: Optional[str] = None,
         price: Optional[float] = None,
         release_date: Optional[date] = None,
-        search: Optional[str] = None
-    ) -> Tuple[List[Book], int]:
-        print(price, release_date)
-        """Get paginated books with optional filtering"""
-        paginated_books, total = self.book_repository.get_paginated(
+        search: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+        approximate: bool = False
+    ) -> Tuple[Page, int]:
+        """
+        Get paginated books with optional filtering, served from the cache when possible
+
+        With `fields`, only those columns are loaded and the page holds lightweight
+        rows exposing them as attributes instead of Book objects. The total comes
+        from count_books, so it may be an estimate when `approximate` is set.
+        """
+        filters = dict(author=author, category=category, price=price, release_date=release_date, search=search)
+        ttl = self._cache_ttl()
+        key = None
+        if ttl:
+            key = self._cache_key(
+                'page',
+                page=page,
+                per_page=per_page,
+                fields=list(fields) if fields else None,
+                approximate=approximate,
+                **self._normalize_filters(**filters)
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                if fields:
+                    items = [_projected_row_type(fields)(*row) for row in cached['items']]
+                else:
+                    items = [_from_row(row) for row in cached['items']]
+                books = Page(items, page, per_page, cached['total'], cached['total_approximate'])
+                return books, books.total
+
+        total, total_approximate = self.count_books(approximate=approximate, **filters)
+        paginated_books, _ = self.book_repository.get_paginated(
             page=page,
             per_page=per_page,
+            columns=fields,
+            count=False,
+            **filters
+        )
+        books = Page(list(paginated_books.items), page, per_page, total, total_approximate)
+        if key:
+            items = [tuple(row) for row in books] if fields else [_to_row(book) for book in books]
+            cache.set(key, {'items': items, 'total': total, 'total_approximate': total_approximate}, ttl)
+        return books, total
+
+    def count_books(
+        self,
+        approximate: bool = False,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        price: Optional[float] = None,
+        release_date: Optional[date] = None,
+        search: Optional[str] = None
+    ) -> Tuple[int, bool]:
+        """
+        Count the books matching the filters, returning (total, is_approximate)
+
+        Exact counts are cached per normalized filter set until the next write or
+        BOOK_COUNT_CACHE_TTL. With `approximate`, an unfiltered total is read
+        from table statistics when the database keeps them.
+        """
+        filters = dict(author=author, category=category, price=price, release_date=release_date, search=search)
+        normalized = self._normalize_filters(**filters)
+        if approximate and not any(normalized.values()):
+            estimate = self.book_repository.estimate_count()
+            if estimate is not None:
+                return estimate, True
+
+        ttl = current_app.config.get('BOOK_COUNT_CACHE_TTL', 300)
+        key = self._cache_key('count', **normalized) if ttl else None
+        if key:
+            total = cache.get(key)
+            if total is not None:
+                return total, False
+
+        total = self.book_repository.count(**filters)
+        if key:
+            cache.set(key, total, ttl)
+        return total, False
+
+    def get_books_by_cursor(
+        self,
+        per_page: int = 10,
+        cursor: Optional[str] = None,
+        sort: str = 'id',
+        order: str = 'asc',
+        include_total: bool = False,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        price: Optional[float] = None,
+        release_date: Optional[date] = None,
+        search: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+        approximate: bool = False
+    ) -> Tuple[List[Book], Optional[str], Optional[int], bool]:
+        """
+        Get the page of books after a cursor, returning (books, next_cursor, total, total_approximate)
+
+        With `fields`, only those columns (and the sort column) are loaded. The
+        total is only counted with `include_total`, see count_books.
+        """
+        if sort not in KEYSET_SORT_COLUMNS:
+            raise ValueError(f"Invalid sort field, expected one of: {', '.join(KEYSET_SORT_COLUMNS)}")
+        if order not in ('asc', 'desc'):
+            raise ValueError("Invalid sort order, expected 'asc' or 'desc'")
+
+        value_type = KEYSET_SORT_COLUMNS[sort].type.python_type
+        after = decode_cursor(cursor, sort, order, value_type) if cursor else None
+        total, total_approximate = None, False
+        if include_total:
+            total, total_approximate = self.count_books(
+                approximate=approximate,
+                author=author,
+                category=category,
+                price=price,
+                release_date=release_date,
+                search=search
+            )
+        books, has_next = self.book_repository.get_keyset_page(
+            per_page=per_page,
+            sort=sort,
+            order=order,
+            after=after,
+            author=author,
+            category=category,
+            price=price,
+            release_date=release_date,
+            search=search,
+            columns=fields
+        )
+
+        next_cursor = None
+        if has_next:
+            last = books[-1]
+            next_cursor = encode_cursor(sort, order, getattr(last, sort), last.id)
+        return books, next_cursor, total, total_approximate
+
+    def export_books(
+        self,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        price: Optional[float] = None,
+        release_date: Optional[date] = None,
+        search: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> Tuple[List[str], Iterator[tuple]]:
+        """Stream every matching book as column tuples, returning (column names, rows)"""
+        rows = self.book_repository.stream_columns(
+            EXPORT_COLUMNS,
+            batch_size=batch_size,
             author=author,
             category=category,
             price=price,
             release_date=release_date,
             search=search
         )
-        return paginated_books, total
-        
+        return EXPORT_COLUMNS, rows
+
     def get_books(self) -> List[Book]:
         """Get all books"""
         return self.book_repository.list_all()
 
     def update_book(self, book_id: int, data: dict) -> Optional[Book]:
         """Update a book with validation"""
-        book = self.book_repository.get_by_id(book_id)
+        columns = Book.__table__.columns.keys()
+        values = {
+            field: value for field, value in data.items()
+            if field in columns and field not in MANAGED_COLUMNS and value is not None
+        }
+
+        book = self.book_repository.update_by_id(book_id, values)
         if not book:
             return None
-        
-        # Update book fields
-        for field, value in data.items():
-            if hasattr(book, field) and value is not None:
-                setattr(book, field, value)
-        
-        return self.book_repository.update(book)
+
+        self._invalidate_cache(book_id)
+        return book
+
+    def reserve_stock(self, items: List[Tuple[int, int]], all_or_nothing: bool = False) -> List[Reservation]:
+        """
+        Reserve (book_id, quantity) items by decrementing stock in the database, never below zero
+
+        Items succeed or fail independently, unless `all_or_nothing` is set, in
+        which case either every item is reserved or none is.
+
+        Raises:
+            ValueError: If there are no items, more than BOOK_RESERVE_MAX_ITEMS, or a quantity below 1
+        """
+        max_items = current_app.config.get('BOOK_RESERVE_MAX_ITEMS', 100)
+        if not items:
+            raise ValueError("Nothing to reserve")
+        if len(items) > max_items:
+            raise ValueError(f"At most {max_items} items can be reserved at once")
+        if any(quantity < 1 for _, quantity in items):
+            raise ValueError("Quantity must be at least 1")
+
+        outcome = self.book_repository.reserve_stock(items, all_or_nothing=all_or_nothing)
+        reserved_ids = {book_id for (book_id, _), (reserved, _) in zip(items, outcome) if reserved}
+        if reserved_ids:
+            self._invalidate_cache(*reserved_ids)
+        return [
+            Reservation(book_id, quantity, reserved, stock)
+            for (book_id, quantity), (reserved, stock) in zip(items, outcome)
+        ]
 
     def delete_book(self, book_id: int) -> bool:
         """Delete a book"""
-        book = self.book_repository.get_by_id(book_id)
+        # From the primary: the delete checks row_version, which a lagging replica may not have caught up on
+        with use_primary():
+            book = self.book_repository.get_by_id(book_id)
         if not book:
             return False
         
         self.book_repository.delete(book)
+        self._invalidate_cache(book_id)
         return True
 
-    def get_books_by_author(self, author: str) -> List[Book]:
-        """Get all books by a specific author"""
-        books = self.book_repository.list_all()
-        return [book for book in books if book.author == author]
+    def get_books_by_author(self, author: str, page: Optional[int] = None, per_page: int = 100) -> List[Book]:
+        """Get books by a specific author, optionally one page at a time"""
+        return self._find(page, per_page, author=author)
 
-    def get_books_by_category(self, category: str) -> List[Book]:
-        """Get all books in a specific category"""
-        books = self.book_repository.list_all()
-        return [book for book in books if book.category == category]
+    def get_books_by_category(self, category: str, page: Optional[int] = None, per_page: int = 100) -> List[Book]:
+        """Get books in a specific category, optionally one page at a time"""
+        return self._find(page, per_page, category=category)
 
-    def search_books(self, query: str) -> List[Book]:
-        """Search books by title, description, author, and category"""
-        books = self.book_repository.list_all()
-        query_lower = query.lower()
-        
-        return [
-            book for book in books
-            if query_lower in book.title.lower() or
-               (book.description and query_lower in book.description.lower()) or
-               query_lower in book.author.lower() or
-               query_lower in book.category.lower()
-        ]
+    def search_books(self, query: str, page: Optional[int] = None, per_page: int = 100) -> List[Book]:
+        """Search books by title, description, author, and category, best matches first"""
+        return self._find(page, per_page, search=query)
+
+    def iter_books(
+        self,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        search: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> Iterator[Book]:
+        """Stream matching books in batches without loading them all into memory"""
+        return self.book_repository.stream(
+            author=author,
+            category=category,
+            search=search,
+            batch_size=batch_size
+        )
+
+    def _find(self, page: Optional[int], per_page: int, **filters) -> List[Book]:
+        if page is None:
+            return self.book_repository.find(**filters)
+        return self.book_repository.find(limit=per_page, offset=(max(page, 1) - 1) * per_page, **filters)
+
+    def _book_values(self, data: dict) -> dict:
+        return {
+            'title': data['title'],
+            'description': data.get('description'),
+            'release_date': data.get('release_date'),
+            'price': data.get('price'),
+            'author': data['author'],
+            'category': data['category'],
+            'stock': data.get('stock', 0),
+            'creator': data.get('creator', 'System'),
+        }
+
+    def _cache_ttl(self) -> int:
+        return current_app.config.get('BOOK_CACHE_TTL', 300)
+
+    def _version_ttl(self) -> int:
+        # Its own expiry, not BOOK_CACHE_TTL: listing ETags and count cache keys
+        # embed the version, so they survive with listing caching turned off.
+        # Expiring at all bounds how long writes made outside the server
+        # processes (scripts, jobs) go unnoticed
+        return current_app.config.get('BOOK_CATALOGUE_VERSION_TTL', 3600)
+
+    def _seed_catalogue_version(self) -> int:
+        # Seed from the clock so a lost counter never reuses an old version
+        version = time.time_ns()
+        cache.set(CATALOGUE_VERSION_KEY, version, self._version_ttl())
+        return version
+
+    def catalogue_version(self) -> int:
+        """Version of the whole catalogue, bumped by every write made through this service"""
+        version = cache.get(CATALOGUE_VERSION_KEY)
+        if version is None:
+            version = self._seed_catalogue_version()
+        return int(version)
+
+    def _normalize_filters(
+        self,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        price: Optional[float] = None,
+        release_date: Optional[date] = None,
+        search: Optional[str] = None
+    ) -> dict:
+        """Normalize filters the way the repository applies them, so equivalent requests share cache keys"""
+        return {
+            # ilike and full-text matching are case-insensitive; empty values are not applied
+            'author': (author or '').lower() or None,
+            'category': (category or '').lower() or None,
+            'search': (search or '').lower() or None,
+            'price': price or None,
+            'release_date': release_date.isoformat() if release_date else None,
+        }
+
+    def _cache_key(self, kind: str, **parts) -> str:
+        """Build a listing cache key tied to the current catalogue version"""
+        digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+        return f"books:{kind}:{self.catalogue_version()}:{digest}"
+
+    def _invalidate_cache(self, *book_ids: int) -> None:
+        if book_ids:
+            cache.delete(*[f"book:{book_id}" for book_id in book_ids])
+        if cache.get(CATALOGUE_VERSION_KEY) is None:
+            self._seed_catalogue_version()
+        else:
+            # incr keeps the key's expiry
+            cache.incr(CATALOGUE_VERSION_KEY)
 
 book_service = BookService()
\ No newline at end of file
@@ -1,11 +1,27 @@
+import re
 from typing import Optional, Dict, Any, Tuple
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+
+from flask import current_app
+from flask_jwt_extended import decode_token
+
+from app import cache, login_tracker, token_blocklist
 from app.models.user import User
 from app.repositories.user_repository import UserRepository
 from app.utils.security import SecurityUtils
+from app.utils.db_routing import use_primary
 from app.utils.exceptions import ValidationError, AuthenticationError, UserNotFoundError
 
 
+# Columns kept in the profile cache; the password hash never leaves the database
+PROFILE_COLUMNS = [column.key for column in User.__table__.columns if column.key != 'password_hash']
+
+# Violated unique constraint, as named by MySQL ("for key 'users.ix_users_email'"),
+# PostgreSQL ('constraint "ix_users_email"') and SQLite ("failed: users.email")
+DUPLICATE_KEY = re.compile(r"for key '([^']+)'|constraint \"([^\"]+)\"|UNIQUE constraint failed: (\S+)")
+
+
 class UserService:
     """Service class for user-related operations"""
     
@@ -31,13 +47,6 @@ class UserService:
         # Validate input data
         self._validate_registration_data(username, email, password)
         
-        # Check if user already exists
-        if self.user_repository.get_by_username(username):
-            raise ValidationError("Username already exists")
-        
-        if self.user_repository.get_by_email(email):
-            raise ValidationError("Email already exists")
-        
         # Create new user
         user = User(
             username=username,
@@ -49,9 +58,11 @@ class UserService:
         # Set password (this will hash it)
         user.set_password(password)
         
-        # Save user to database
+        # Save user to database; the unique indexes reject taken usernames and emails
         try:
             saved_user = self.user_repository.add(user)
+        except IntegrityError as e:
+            raise ValidationError(self._duplicate_message(e))
         except Exception as e:
             raise ValidationError(f"Failed to create user: {str(e)}")
         
@@ -83,10 +94,11 @@ class UserService:
         if not username or not password:
             raise AuthenticationError("Username and password are required")
         
-        # Find user by username or email
-        user = self.user_repository.get_by_username(username)
-        if not user:
-            user = self.user_repository.get_by_email(username)
+        # Find user by username or email, on the primary: a login right after
+        # signUp has no session to stick it there, and a lagging replica would
+        # answer "Invalid credentials"
+        with use_primary():
+            user = self.user_repository.get_by_username_or_email(username)
         
         if not user:
             raise AuthenticationError("Invalid credentials")
@@ -99,6 +111,11 @@ class UserService:
         if not user.check_password(password):
             raise AuthenticationError("Invalid credentials")
         
+        # Upgrade hashes made with older parameters while the plain password is at hand
+        if user.password_needs_rehash():
+            user.set_password(password)
+            self.user_repository.update(user)
+        
         # Generate tokens
         tokens = self.security_utils.create_tokens(
             user_id=user.id,
@@ -108,16 +125,57 @@ class UserService:
             }
         )
         
-        # Update last login time (if you add this field to the model)
-        user.updated_at = datetime.now()
-        self.user_repository.update(user)
+        # Record the login; timestamps are written in batches, not per request
+        login_tracker.record(user)
+        self._cache_profile(user)
         
         return user, tokens
     
+    def logout_user(self, access_claims: Dict[str, Any], refresh_token: Optional[str] = None) -> None:
+        """
+        Revoke the access token of the current request, and the user's refresh token if given
+        
+        The access token is revoked first, so a bad refresh token never leaves
+        the caller logged in. An expired refresh token is fine, there is simply
+        nothing left to revoke.
+        
+        Raises:
+            AuthenticationError: If the refresh token is invalid or belongs to someone else
+        """
+        token_blocklist.revoke(access_claims)
+        if not refresh_token:
+            return
+        
+        try:
+            refresh_claims = decode_token(refresh_token, allow_expired=True)
+        except Exception:
+            raise AuthenticationError("Invalid refresh token")
+        if refresh_claims.get('type') != 'refresh' or refresh_claims.get('sub') != access_claims.get('sub'):
+            raise AuthenticationError("Invalid refresh token")
+        token_blocklist.revoke(refresh_claims)
+    
     def get_user_by_id(self, user_id: int) -> Optional[User]:
         """Get user by ID"""
         return self.user_repository.get_by_id(user_id)
     
+    def get_user_profile(self, user_id: int) -> Optional[User]:
+        """
+        Get a user for the profile endpoint, served from the cache when possible
+        
+        Cached users are detached and have no password hash, so they must not be
+        used for authentication, token refresh or modified.
+        """
+        if self._profile_ttl():
+            row = cache.get(self._profile_key(user_id))
+            if row is not None:
+                return User(**row)
+        
+        user = self.user_repository.get_by_id(user_id)
+        if user:
+            login_tracker.apply_pending(user)
+            self._cache_profile(user)
+        return user
+    
     def get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username"""
         return self.user_repository.get_by_username(username)
@@ -139,9 +197,7 @@ class UserService:
             UserNotFoundError: If user not found
             ValidationError: If validation fails
         """
-        user = self.user_repository.get_by_id(user_id)
-        if not user:
-            raise UserNotFoundError("User not found")
+        user = self._get_for_update(user_id)
         
         if username:
             # Validate username
@@ -170,7 +226,9 @@ class UserService:
         # Update timestamp
         user.updated_at = datetime.now()
         
-        return self.user_repository.update(user)
+        user = self.user_repository.update(user)
+        self._invalidate_profile(user_id)
+        return user
     
     def change_password(self, user_id: int, current_password: str, new_password: str) -> bool:
         """
@@ -189,9 +247,7 @@ class UserService:
             AuthenticationError: If current password is wrong
             ValidationError: If new password is invalid
         """
-        user = self.user_repository.get_by_id(user_id)
-        if not user:
-            raise UserNotFoundError("User not found")
+        user = self._get_for_update(user_id)
         
         # Verify current password
         if not user.check_password(current_password):
@@ -207,32 +263,68 @@ class UserService:
         user.updated_at = datetime.now()
         
         self.user_repository.update(user)
+        self._invalidate_profile(user_id)
         return True
     
     def deactivate_user(self, user_id: int) -> bool:
         """Deactivate a user account"""
-        user = self.user_repository.get_by_id(user_id)
-        if not user:
-            raise UserNotFoundError("User not found")
+        user = self._get_for_update(user_id)
         
         user.is_active = False
         user.updated_at = datetime.now()
         
         self.user_repository.update(user)
+        self._invalidate_profile(user_id)
         return True
     
     def activate_user(self, user_id: int) -> bool:
         """Activate a user account"""
-        user = self.user_repository.get_by_id(user_id)
-        if not user:
-            raise UserNotFoundError("User not found")
+        user = self._get_for_update(user_id)
         
         user.is_active = True
         user.updated_at = datetime.now()
         
         self.user_repository.update(user)
+        self._invalidate_profile(user_id)
         return True
     
+    def _get_for_update(self, user_id: int) -> User:
+        """Load a user from the primary, since it is about to be modified"""
+        with use_primary():
+            user = self.user_repository.get_by_id(user_id)
+        if not user:
+            raise UserNotFoundError("User not found")
+        return user
+    
+    def _profile_ttl(self) -> int:
+        return current_app.config.get('USER_PROFILE_CACHE_TTL', 60)
+    
+    @staticmethod
+    def _profile_key(user_id) -> str:
+        # JWT identities are strings, repository callers pass ints
+        return f"user:{int(user_id)}"
+    
+    def _cache_profile(self, user: User) -> None:
+        ttl = self._profile_ttl()
+        if ttl:
+            cache.set(self._profile_key(user.id), {key: getattr(user, key) for key in PROFILE_COLUMNS}, ttl)
+    
+    def _invalidate_profile(self, user_id) -> None:
+        cache.delete(self._profile_key(user_id))
+    
+    @staticmethod
+    def _duplicate_message(error: IntegrityError) -> str:
+        """Tell which unique column an insert collided with, from the constraint named in the driver's message"""
+        # Only the constraint name is looked at: MySQL also quotes the duplicate value,
+        # which may itself contain "email" or "username"
+        match = DUPLICATE_KEY.search(str(error.orig))
+        constraint = (match.group(1) or match.group(2) or match.group(3)).lower() if match else ''
+        if constraint in ('ix_users_email', 'users.ix_users_email', 'users.email'):
+            return "Email already exists"
+        if constraint in ('ix_users_username', 'users.ix_users_username', 'users.username'):
+            return "Username already exists"
+        return "Username or email already exists"
+    
     def _validate_registration_data(self, username: str, email: str, password: str) -> None:
         """Validate registration data"""
         # Validate username
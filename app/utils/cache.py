@@ -0,0 +1,236 @@
+"""
+Cache backends and the Flask cache extension
+"""
+import fnmatch
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Sequence
+
+from flask import Flask, current_app
+
+
+class CacheBackend:
+    """Interface every cache backend implements. Keys are strings, values are picklable."""
+
+    def get(self, key: str) -> Any:
+        """Return the cached value, or None on a miss"""
+        raise NotImplementedError
+
+    def get_many(self, keys: Sequence[str]) -> List[Any]:
+        """Return the cached values of `keys` in order, None for misses"""
+        return [self.get(key) for key in keys]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, expiring it after `ttl` seconds if given"""
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """Atomically increment an integer counter, starting from 0 when missing"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with per-entry TTL. Each worker process has its own copy."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value, expires_at = self._entries.get(key, (0, None))
+            self._entries[key] = (value + 1, expires_at)
+            self._entries.move_to_end(key)
+            return value + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(CacheBackend):
+    """Cache backed by a Redis-compatible client, shared by every worker"""
+
+    def __init__(self, client, prefix: str = "bookstore:"):
+        self.client = client
+        self.prefix = prefix
+
+    @staticmethod
+    def _dump(value: Any) -> bytes:
+        # Integers are stored as plain numbers so INCR keeps working on them
+        if type(value) is int:
+            return str(value).encode()
+        return b"!" + pickle.dumps(value)
+
+    @staticmethod
+    def _load(value: bytes) -> Any:
+        if value.startswith(b"!"):
+            return pickle.loads(value[1:])
+        return int(value)
+
+    def get(self, key: str) -> Any:
+        value = self.client.get(self.prefix + key)
+        return None if value is None else self._load(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        px = int(ttl * 1000) if ttl else None
+        self.client.set(self.prefix + key, self._dump(value), px=px)
+
+    def get_many(self, keys: Sequence[str]) -> List[Any]:
+        if not keys:
+            return []
+        values = self.client.mget([self.prefix + key for key in keys])
+        return [None if value is None else self._load(value) for value in values]
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(self.prefix + key)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class InMemoryRedis:
+    """
+    Minimal stand-in for a redis-py client, covering the commands RedisCache uses.
+    Selected with CACHE_REDIS_URL = "memory://" for tests and local development.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, name: str):
+        entry = self._data.get(name)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[name]
+            return None
+        return entry
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(name)
+            return None if entry is None else entry[0]
+
+    def mget(self, names: Sequence[str]) -> List[Optional[bytes]]:
+        with self._lock:
+            return [None if entry is None else entry[0] for entry in map(self._live, names)]
+
+    def set(self, name: str, value, ex: Optional[int] = None, px: Optional[int] = None) -> bool:
+        ttl = px / 1000 if px else ex
+        with self._lock:
+            self._data[name] = (value, time.monotonic() + ttl if ttl else None)
+        return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            entry = self._live(name)
+            value = int(entry[0]) + amount if entry else amount
+            self._data[name] = (str(value).encode(), entry[1] if entry else None)
+            return value
+
+    def scan_iter(self, match: Optional[str] = None) -> Iterable[str]:
+        with self._lock:
+            names = list(self._data)
+        return [name for name in names if match is None or fnmatch.fnmatchcase(name, match)]
+
+
+def create_backend(config) -> CacheBackend:
+    """Build the cache backend selected by CACHE_BACKEND ('memory' or 'redis')"""
+    kind = config.get("CACHE_BACKEND", "memory")
+    if kind == "memory":
+        if int(config.get("WEB_CONCURRENCY", 1)) > 1:
+            # Invalidation would only reach the worker that made the write
+            raise RuntimeError(
+                "CACHE_BACKEND = 'memory' can't be invalidated across "
+                f"{config['WEB_CONCURRENCY']} server processes, use 'redis'"
+            )
+        return MemoryCache(max_entries=config.get("CACHE_MAX_ENTRIES", 10000))
+    if kind == "redis":
+        url = config.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+        if url == "memory://":
+            client = InMemoryRedis()
+        else:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND = 'redis' requires the redis package")
+            client = redis.Redis.from_url(url)
+        return RedisCache(client, prefix=config.get("CACHE_KEY_PREFIX", "bookstore:"))
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind!r}")
+
+
+class Cache:
+    """Flask extension exposing the configured cache backend of the current app"""
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions["cache"] = create_backend(app.config)
+
+    @property
+    def backend(self) -> CacheBackend:
+        return current_app.extensions["cache"]
+
+    def get(self, key: str) -> Any:
+        return self.backend.get(key)
+
+    def get_many(self, keys: Sequence[str]) -> List[Any]:
+        return self.backend.get_many(keys)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.backend.set(key, value, ttl)
+
+    def delete(self, *keys: str) -> None:
+        self.backend.delete(*keys)
+
+    def incr(self, key: str) -> int:
+        return self.backend.incr(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
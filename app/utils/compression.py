@@ -0,0 +1,206 @@
+"""
+Negotiated response compression
+
+Responses whose content type has levels in COMPRESSION_LEVELS (DEFAULT_LEVELS
+unless configured) are compressed with the first of COMPRESSION_ALGORITHMS the
+client accepts: zstd and br when the zstandard / brotli packages are
+installed, gzip always. Bodies under
+COMPRESSION_MIN_SIZE are sent as is. Streamed responses (the export) are
+compressed chunk by chunk and flushed after each chunk, so they keep streaming.
+
+A compressed body is a different representation, so its strong ETag gets the
+encoding appended ("book-1-3-gzip"); app.utils.conditional accepts either form.
+"""
+import gzip
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from flask import Flask, Response, request
+
+from app.utils.metrics import MetricsRegistry
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        # wbits 31: a gzip container around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Content-Encoding token: (one-shot compress(data, level), streaming compressor factory)
+ENCODERS: Dict[str, tuple] = {
+    'gzip': (lambda data, level: gzip.compress(data, compresslevel=level, mtime=0), _GzipStream),
+    'br': (lambda data, level: brotli.compress(data, quality=level), _BrotliStream),
+    'zstd': (lambda data, level: zstandard.ZstdCompressor(level=level).compress(data), _ZstdStream),
+}
+
+# Compression level per content type and algorithm
+DEFAULT_LEVELS: Dict[str, Dict[str, int]] = {
+    'application/json': {'gzip': 6, 'br': 5, 'zstd': 6},
+    # Streamed exports are compressed as they are produced, so favour speed
+    'application/x-ndjson': {'gzip': 4, 'br': 3, 'zstd': 3},
+    'text/csv': {'gzip': 4, 'br': 3, 'zstd': 3},
+    'text/plain': {'gzip': 6, 'br': 5, 'zstd': 6},
+    'text/html': {'gzip': 6, 'br': 5, 'zstd': 6},
+}
+
+INSTALLED = {'gzip': True, 'br': brotli is not None, 'zstd': zstandard is not None}
+
+
+def parse_algorithms(value) -> List[str]:
+    """Installed algorithms from COMPRESSION_ALGORITHMS, in server preference order"""
+    names = [name.strip() for name in value.split(',')] if isinstance(value, str) else list(value)
+    unknown = [name for name in names if name and name not in ENCODERS]
+    if unknown:
+        raise ValueError(f"Unknown COMPRESSION_ALGORITHMS: {', '.join(unknown)}")
+    return [name for name in names if name and INSTALLED[name]]
+
+
+def negotiate(algorithms: List[str]) -> Optional[str]:
+    """The accepted algorithm with the highest q-value, ties going to server preference"""
+    best, best_quality = None, 0
+    for name in algorithms:
+        quality = request.accept_encodings[name]
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    return f"{etag}-{encoding}"
+
+
+class Compression:
+    """Flask extension compressing responses in an after_request hook"""
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        algorithms = parse_algorithms(app.config.get('COMPRESSION_ALGORITHMS', 'zstd,br,gzip'))
+        if not app.config.get('COMPRESSION_ENABLED', True) or not algorithms:
+            return
+
+        levels: Dict[str, Dict[str, int]] = app.config.get('COMPRESSION_LEVELS') or DEFAULT_LEVELS
+        min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        registry: MetricsRegistry = app.extensions['metrics']
+        bytes_in = registry.counter(
+            'http_response_compression_input_bytes_total', 'Response bytes before compression', ['encoding']
+        )
+        bytes_out = registry.counter(
+            'http_response_compression_output_bytes_total', 'Response bytes sent after compression', ['encoding']
+        )
+        bytes_saved = registry.counter(
+            'http_response_compression_saved_bytes_total', 'Response bytes saved by compression', ['encoding']
+        )
+
+        def record(encoding: str, size: int, compressed_size: int) -> None:
+            bytes_in.inc(size, encoding=encoding)
+            bytes_out.inc(compressed_size, encoding=encoding)
+            bytes_saved.inc(size - compressed_size, encoding=encoding)
+
+        @app.after_request
+        def compress_response(response: Response) -> Response:
+            content_levels = levels.get(response.mimetype)
+            if content_levels is None:
+                return response
+            response.vary.add('Accept-Encoding')
+            if (
+                request.method == 'HEAD'
+                or response.status_code < 200
+                or response.status_code in (204, 206, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+            ):
+                return response
+
+            encoding = negotiate([name for name in algorithms if name in content_levels])
+            if encoding is None:
+                return response
+            compress, stream = ENCODERS[encoding]
+            level = content_levels[encoding]
+
+            if response.is_streamed:
+                response.response = _compress_stream(
+                    response.iter_encoded(), response.response, stream(level),
+                    lambda size, compressed_size: record(encoding, size, compressed_size)
+                )
+                response.headers.pop('Content-Length', None)
+            else:
+                data = response.get_data()
+                if len(data) < min_size:
+                    return response
+                compressed = compress(data, level)
+                if len(compressed) >= len(data):
+                    return response
+                response.set_data(compressed)
+                record(encoding, len(data), len(compressed))
+
+            response.headers['Content-Encoding'] = encoding
+            etag, weak = response.get_etag()
+            if etag and not weak:
+                response.set_etag(encoded_etag(etag, encoding))
+            return response
+
+
+def _compress_stream(
+    chunks: Iterable[bytes],
+    source,
+    compressor,
+    record: Callable[[int, int], None]
+) -> Iterator[bytes]:
+    """Compress and flush each chunk as it is produced, closing `source` when done"""
+    size = compressed_size = 0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            output = compressor.compress(chunk)
+            compressed_size += len(output)
+            yield output
+        output = compressor.finish()
+        compressed_size += len(output)
+        yield output
+    finally:
+        record(size, compressed_size)
+        if hasattr(source, 'close'):
+            source.close()
@@ -0,0 +1,69 @@
+"""
+HTTP conditional requests
+
+Validators (ETag, Last-Modified) are computed from what the resource already
+knows about its version, so a matching If-None-Match / If-Modified-Since is
+answered with 304 Not Modified before the body is serialized.
+"""
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from flask import Response, current_app, request
+from werkzeug.http import http_date, quote_etag
+
+from app.utils.compression import ENCODERS, encoded_etag
+
+
+def book_etag(book) -> str:
+    """Strong ETag of a single book, from its id and row version"""
+    return f"book-{book.id}-{book.row_version}"
+
+
+def listing_etag(catalogue_version: int) -> str:
+    """
+    Strong ETag of a book listing: the catalogue version, which every write
+    bumps, plus the query string the page was built from
+    """
+    digest = hashlib.sha1(request.query_string).hexdigest()[:16]
+    return f"books-{catalogue_version}-{digest}"
+
+
+def _http_seconds(value: datetime) -> datetime:
+    # HTTP dates have second precision; naive datetimes are taken as UTC, as http_date does
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {
+        'ETag': quote_etag(etag),
+        'Cache-Control': current_app.config.get('BOOK_HTTP_CACHE_CONTROL', 'private, no-cache'),
+    }
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    The 304 response for the current request if its validators match, else None
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2). The
+    ETag of a compressed response has its encoding appended, so those variants
+    match too and the 304 repeats the one the client holds.
+    """
+    if request.if_none_match:
+        matches = False
+        for candidate in [etag] + [encoded_etag(etag, encoding) for encoding in ENCODERS]:
+            if request.if_none_match.contains_weak(candidate):
+                etag, matches = candidate, True
+                break
+    elif request.if_modified_since and last_modified is not None:
+        matches = _http_seconds(last_modified) <= request.if_modified_since
+    else:
+        matches = False
+    if not matches:
+        return None
+    return Response(status=304, headers=validator_headers(etag, last_modified))
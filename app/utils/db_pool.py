@@ -0,0 +1,98 @@
+"""
+Connection pool options and instrumentation
+
+SQLALCHEMY_ENGINE_OPTIONS in the config classes holds the pool settings for
+server databases; engine_options adapts them to what a given URL's pool and
+driver accept, and instrument_engine reports the pool to the metrics registry.
+"""
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+from app.utils.metrics import MetricsRegistry
+
+
+# Options only a QueuePool accepts
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_use_lifo')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool timing how long each checkout waits for a connection"""
+
+    observe_wait = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.observe_wait is not None:
+                self.observe_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        # engine.dispose() swaps in a recreated pool, which must keep reporting
+        pool = super().recreate()
+        pool.observe_wait = self.observe_wait
+        return pool
+
+
+def engine_options(url: str, options: dict, config) -> dict:
+    """
+    Adapt the configured engine options to the database at `url`
+
+    In-memory SQLite shares one connection through a StaticPool, which takes no
+    pool sizing; MySQL gets the DB_CONNECT_TIMEOUT / DB_READ_TIMEOUT socket timeouts.
+    """
+    options = dict(options)
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+
+    if backend == 'sqlite' and parsed.database in (None, '', ':memory:'):
+        for key in QUEUE_POOL_OPTIONS + ('pool_recycle', 'pool_pre_ping'):
+            options.pop(key, None)
+        return options
+
+    options.setdefault('poolclass', InstrumentedQueuePool)
+    if backend in ('mysql', 'mariadb'):
+        connect_args = dict(options.get('connect_args', {}))
+        if config.get('DB_CONNECT_TIMEOUT'):
+            connect_args.setdefault('connect_timeout', config['DB_CONNECT_TIMEOUT'])
+        if config.get('DB_READ_TIMEOUT'):
+            connect_args.setdefault('read_timeout', config['DB_READ_TIMEOUT'])
+            connect_args.setdefault('write_timeout', config['DB_READ_TIMEOUT'])
+        options['connect_args'] = connect_args
+    return options
+
+
+def instrument_engine(engine: Engine, registry: MetricsRegistry, bind: str = 'default') -> None:
+    """Count checkouts, new connections and invalidations, time checkout waits and expose pool gauges"""
+    checkouts = registry.counter('db_pool_checkouts_total', 'Connections checked out of the pool', ['bind'])
+    connects = registry.counter('db_pool_connections_opened_total', 'New DBAPI connections opened', ['bind'])
+    invalidations = registry.counter(
+        'db_pool_invalidations_total', 'Connections invalidated after errors or failed pre-pings', ['bind', 'soft']
+    )
+    wait = registry.histogram(
+        'db_pool_checkout_seconds', 'Time to get a connection from the pool, including opening a new one', ['bind']
+    )
+
+    event.listen(engine, 'checkout', lambda *args: checkouts.inc(bind=bind))
+    event.listen(engine, 'connect', lambda *args: connects.inc(bind=bind))
+    event.listen(engine, 'invalidate', lambda *args: invalidations.inc(bind=bind, soft='false'))
+    event.listen(engine, 'soft_invalidate', lambda *args: invalidations.inc(bind=bind, soft='true'))
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.observe_wait = lambda seconds: wait.observe(seconds, bind=bind)
+
+    def pool_state(read) -> Dict[tuple, float]:
+        # engine.pool is looked up per scrape since dispose() replaces it
+        pool = engine.pool
+        return {(bind,): read(pool)} if isinstance(pool, QueuePool) else {}
+
+    registry.gauge('db_pool_size', 'Connections the pool keeps open', ['bind']).add_callback(
+        lambda: pool_state(lambda pool: pool.size()))
+    registry.gauge('db_pool_checked_out', 'Connections currently in use', ['bind']).add_callback(
+        lambda: pool_state(lambda pool: pool.checkedout()))
+    registry.gauge('db_pool_overflow', 'Connections open beyond pool_size (negative while below it)', ['bind']).add_callback(
+        lambda: pool_state(lambda pool: pool.overflow()))
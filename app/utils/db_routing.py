@@ -0,0 +1,185 @@
+"""
+Read replica routing
+
+With a "replica" entry in SQLALCHEMY_BINDS, repository methods decorated with
+@replica_read query the replica instead of the primary, unless:
+
+- the current session has already written (reads after a write in the same
+  request see it),
+- the current user wrote within REPLICA_STICKY_SECONDS (read-your-writes
+  across requests, tracked in the app cache, which therefore has to be the
+  shared 'redis' backend: with a per-process cache a write served by one
+  worker would not keep the user's next request on another worker off the
+  replica),
+- the replica lags more than REPLICA_MAX_LAG seconds, or its lag is unknown,
+- the code runs inside use_primary().
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from flask import current_app, g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+
+
+REPLICA_BIND = "replica"
+
+
+class RoutingSession(Session):
+    """Session sending reads flagged by @replica_read to the replica engine"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if (
+            bind is None
+            and self.info.get("replica_reads")
+            and not self.info.get("wrote")
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+        ):
+            engines = self._db.engines
+            if primary is engines.get(None) and REPLICA_BIND in engines:
+                return engines[REPLICA_BIND]
+        return primary
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _after_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session):
+    if session.info.get("wrote"):
+        _mark_sticky()
+
+
+def _current_identity() -> Optional[str]:
+    if not has_request_context():
+        return None
+    from flask_jwt_extended import get_jwt_identity
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+def _sticky_key(identity) -> str:
+    return f"replica:sticky:{identity}"
+
+
+def _mark_sticky() -> None:
+    identity = _current_identity()
+    seconds = current_app.config.get("REPLICA_STICKY_SECONDS")
+    if seconds is None:
+        seconds = current_app.config.get("REPLICA_MAX_LAG", 5)
+    if identity is not None and seconds and REPLICA_BIND in current_app.config.get("SQLALCHEMY_BINDS", {}):
+        current_app.extensions["cache"].set(_sticky_key(identity), True, seconds)
+
+
+class ReplicaLag:
+    """Replica lag in seconds, probed at most every REPLICA_LAG_CHECK_INTERVAL seconds per process"""
+
+    def __init__(self, interval: float = 5):
+        self.interval = interval
+        self._lag: Optional[float] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self, engine) -> Optional[float]:
+        if time.monotonic() - self._checked_at >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                self._lag = _probe_lag(engine)
+                self._checked_at = time.monotonic()
+            finally:
+                self._lock.release()
+        return self._lag
+
+
+def _probe_lag(engine) -> Optional[float]:
+    """Ask the replica how far behind it is; None when replication is broken or the probe fails"""
+    if engine.dialect.name not in ("mysql", "mariadb"):
+        # Nothing to ask, e.g. a SQLite copy used for local testing
+        return 0.0
+    try:
+        with engine.connect() as connection:
+            try:
+                status = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+            except DBAPIError:
+                # MySQL before 8.0.22 and MariaDB
+                status = connection.execute(text("SHOW SLAVE STATUS")).mappings().first()
+    except DBAPIError:
+        return None
+    if status is None:
+        # Not configured as a replica, e.g. pointed at the primary itself
+        return 0.0
+    lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+
+def _replica_allowed(db) -> bool:
+    """Whether reads of the current request may go to the replica, decided once per request"""
+    if has_request_context() and "replica_allowed" in g:
+        return g.replica_allowed
+
+    engines = db.engines
+    allowed = REPLICA_BIND in engines
+    if allowed:
+        lag = current_app.extensions["replica_lag"].get(engines[REPLICA_BIND])
+        allowed = lag is not None and lag <= current_app.config.get("REPLICA_MAX_LAG", 5)
+    if allowed:
+        identity = _current_identity()
+        allowed = identity is None or not current_app.extensions["cache"].get(_sticky_key(identity))
+
+    if has_request_context():
+        g.replica_allowed = allowed
+    return allowed
+
+
+def replica_read(method):
+    """Run a read-only repository method against the replica when routing allows it"""
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        db = current_app.extensions["sqlalchemy"]
+        info = db.session.info
+        if info.get("primary_only") or info.get("wrote") or not _replica_allowed(db):
+            return method(*args, **kwargs)
+        info["replica_reads"] = info.get("replica_reads", 0) + 1
+        try:
+            return method(*args, **kwargs)
+        finally:
+            info["replica_reads"] -= 1
+
+    return wrapper
+
+
+@contextmanager
+def use_primary():
+    """Keep @replica_read methods on the primary, for reads that are about to be written back"""
+    info = current_app.extensions["sqlalchemy"].session.info
+    info["primary_only"] = info.get("primary_only", 0) + 1
+    try:
+        yield
+    finally:
+        info["primary_only"] -= 1
+
+
+def init_replica_routing(app) -> None:
+    if REPLICA_BIND in app.config.get("SQLALCHEMY_BINDS", {}) and app.config.get("CACHE_BACKEND", "memory") != "redis":
+        raise RuntimeError(
+            "A replica bind needs CACHE_BACKEND = 'redis', read-your-writes stickiness "
+            "is kept in the cache and must be seen by every worker"
+        )
+    app.extensions["replica_lag"] = ReplicaLag(app.config.get("REPLICA_LAG_CHECK_INTERVAL", 5))
@@ -31,3 +31,10 @@ class AuthorizationError(Exception):
         self.message = message
         super().__init__(self.message)
 
+
+
+class ServiceUnavailableError(Exception):
+    """Raised when the server is too busy to handle a request right now"""
+    def __init__(self, message: str = "Service temporarily unavailable"):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,47 @@
+"""
+JSON response encoding for the REST API
+"""
+import json
+from datetime import date
+
+from flask import current_app, make_response
+from flask_restx.representations import output_json as restx_output_json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def check_json_encoder(app) -> None:
+    """Fail fast when API_JSON_ENCODER asks for an encoder that is not installed"""
+    encoder = app.config.get('API_JSON_ENCODER', 'json')
+    if encoder not in ('json', 'orjson'):
+        raise ValueError(f"Unknown API_JSON_ENCODER: {encoder!r}")
+    if encoder == 'orjson' and orjson is None:
+        raise RuntimeError("API_JSON_ENCODER = 'orjson' requires the orjson package")
+
+
+def output_json(data, code, headers=None):
+    """Flask-RESTX JSON representation, encoded with orjson when API_JSON_ENCODER = 'orjson'"""
+    if current_app.config.get('API_JSON_ENCODER', 'json') != 'orjson':
+        return restx_output_json(data, code, headers)
+
+    body = orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+    response = make_response(body, code)
+    response.headers.extend(headers or {})
+    response.mimetype = 'application/json'
+    return response
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data) -> str:
+    """Encode data to a JSON string with the configured encoder"""
+    if current_app.config.get('API_JSON_ENCODER', 'json') == 'orjson':
+        return orjson.dumps(data).decode()
+    return json.dumps(data, default=_default)
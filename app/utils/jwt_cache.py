@@ -0,0 +1,66 @@
+"""
+JWT manager that remembers verified tokens
+
+Clients send the same bearer token on every request until it expires, so the
+claims of a verified token are kept in a bounded LRU keyed by the token's
+digest, and expire with the token. Revocation is still checked per request
+by flask-jwt-extended after decoding.
+"""
+import hashlib
+import time
+from typing import Optional
+
+from flask import Flask, Response, current_app, g, has_request_context
+from flask_jwt_extended import JWTManager
+
+from app.utils.cache import MemoryCache
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager with a per-app cache of decoded tokens and Server-Timing instrumentation"""
+
+    def init_app(self, app: Flask, add_context_processor: bool = False) -> None:
+        super().init_app(app, add_context_processor)
+        size = app.config.get("JWT_VERIFY_CACHE_SIZE", 10000)
+        app.extensions["jwt_cache"] = MemoryCache(max_entries=size) if size else None
+        if app.config.get("JWT_VERIFY_TIMING", True):
+            app.after_request(_server_timing)
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+        started = time.perf_counter()
+        cache: Optional[MemoryCache] = current_app.extensions.get("jwt_cache")
+        # Only the plain verification is cached: CSRF values and expired-token
+        # decoding depend on more than the token itself
+        cacheable = cache is not None and csrf_value is None and not allow_expired
+        key = hashlib.sha256(encoded_token.encode()).hexdigest() if cacheable else None
+
+        claims = cache.get(key) if cacheable else None
+        hit = claims is not None
+        if not hit:
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+            if cacheable:
+                ttl = _remaining_lifetime(claims)
+                if ttl is None or ttl > 0:
+                    cache.set(key, claims, ttl)
+
+        if has_request_context():
+            g.jwt_verify_seconds = g.get("jwt_verify_seconds", 0.0) + time.perf_counter() - started
+            g.jwt_verify_cached = hit
+        return dict(claims)
+
+
+def _remaining_lifetime(claims: dict) -> Optional[float]:
+    """Seconds until the token expires, allowing for JWT_DECODE_LEEWAY; None if it never does"""
+    if "exp" not in claims:
+        return None
+    leeway = current_app.config.get("JWT_DECODE_LEEWAY", 0)
+    if hasattr(leeway, "total_seconds"):
+        leeway = leeway.total_seconds()
+    return claims["exp"] + leeway - time.time()
+
+
+def _server_timing(response: Response) -> Response:
+    if "jwt_verify_seconds" in g:
+        description = "cached" if g.jwt_verify_cached else "verified"
+        response.headers.add("Server-Timing", f'jwt;dur={g.jwt_verify_seconds * 1000:.3f};desc="{description}"')
+    return response
@@ -0,0 +1,132 @@
+"""
+Batched last-login tracking
+
+Logins are read-mostly, so instead of committing a users row per login the
+timestamps are buffered in memory and written by a background thread in one
+executemany UPDATE every LOGIN_FLUSH_INTERVAL seconds.
+"""
+import atexit
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+class LoginBuffer:
+    """Pending login timestamps of one app, flushed by a thread started lazily in each process"""
+
+    def __init__(self, app: Flask, interval: float = 5, max_pending: int = 10000):
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _ensure_thread(self) -> None:
+        # Threads don't survive fork, so a forked worker starts its own flusher
+        # and drops whatever the parent had buffered. The pending lock is replaced
+        # too, as fork may have copied it while another thread held it
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._lock = threading.Lock()
+                    self._wakeup = threading.Event()
+                    self._pending = {}
+                    threading.Thread(target=self._run, name="login-flusher", daemon=True).start()
+                    self._pid = os.getpid()
+
+    def record(self, user_id: int, at: datetime) -> None:
+        if not self.interval:
+            self._write({user_id: at})
+            return
+        self._ensure_thread()
+        with self._lock:
+            self._pending[user_id] = at
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wakeup.set()
+
+    def pending(self, user_id: int) -> Optional[datetime]:
+        """The buffered login time of a user that hasn't been written yet"""
+        if self._pid != os.getpid():
+            return None
+        return self._pending.get(user_id)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Failed to flush login timestamps")
+
+    def flush(self) -> None:
+        """Write every buffered timestamp now, keeping them buffered if the write fails"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with self.app.app_context():
+                self._write(pending)
+        except Exception:
+            with self._lock:
+                # Logins recorded since the swap are newer, so they win
+                for user_id, at in pending.items():
+                    self._pending.setdefault(user_id, at)
+            raise
+
+    def _write(self, pending: Dict[int, datetime]) -> None:
+        db = current_app.extensions["sqlalchemy"]
+        users = db.metadata.tables["users"]
+        statement = (
+            update(users)
+            .where(users.c.id == bindparam("user_id"))
+            # Keep updated_at for profile changes rather than letting onupdate bump it
+            .values(last_login_at=bindparam("at"), updated_at=users.c.updated_at)
+        )
+        try:
+            db.session.execute(statement, [{"user_id": user_id, "at": at} for user_id, at in pending.items()])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class LoginTracker:
+    """Flask extension recording when users last logged in"""
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions["login_tracker"] = LoginBuffer(
+            app,
+            interval=app.config.get("LOGIN_FLUSH_INTERVAL", 5),
+            max_pending=app.config.get("LOGIN_FLUSH_MAX_PENDING", 10000),
+        )
+
+    def record(self, user) -> None:
+        """Buffer a login of `user` and show it on the loaded object without making it dirty"""
+        now = datetime.now()
+        set_committed_value(user, "last_login_at", now)
+        current_app.extensions["login_tracker"].record(user.id, now)
+
+    def apply_pending(self, user) -> None:
+        """Show a login that is still buffered on a user loaded from the database"""
+        at = current_app.extensions["login_tracker"].pending(user.id)
+        if at is not None:
+            set_committed_value(user, "last_login_at", at)
+
+    def flush(self) -> None:
+        current_app.extensions["login_tracker"].flush()
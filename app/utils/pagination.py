@@ -0,0 +1,83 @@
+"""
+Pagination helpers
+"""
+import base64
+import json
+import math
+from typing import Any, List, Optional, Tuple
+
+
+def encode_cursor(sort: str, order: str, value: Any, last_id: int) -> str:
+    """Encode the position of the last row of a page as an opaque cursor token"""
+    payload = json.dumps([sort, order, value, last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _is_instance(value: Any, value_type: type) -> bool:
+    # JSON true/false decode to bool, which is an int subclass
+    return isinstance(value, value_type) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, sort: str, order: str, value_type: type = object) -> Tuple[Any, int]:
+    """
+    Decode a cursor token into its (sort value, id) position
+
+    Raises:
+        ValueError: If the token is malformed, was issued for another ordering,
+            or its sort value is not a `value_type`
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if (cursor_sort, cursor_order) != (sort, order) or not _is_instance(last_id, int):
+        raise ValueError("Cursor does not match the requested sort order")
+    if not _is_instance(value, value_type):
+        raise ValueError("Invalid cursor")
+
+    return value, last_id
+
+
+class Page:
+    """A page of offset-paginated results, exposing the same attributes as Flask-SQLAlchemy's Pagination"""
+
+    def __init__(
+        self,
+        items: List[Any],
+        page: int,
+        per_page: int,
+        total: Optional[int],
+        total_approximate: bool = False
+    ):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.total_approximate = total_approximate
+
+    @property
+    def pages(self) -> int:
+        if not self.total:
+            return 0
+        return math.ceil(self.total / self.per_page)
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 1
+
+    @property
+    def prev_num(self) -> Optional[int]:
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.pages
+
+    @property
+    def next_num(self) -> Optional[int]:
+        return self.page + 1 if self.has_next else None
+
+    def __iter__(self):
+        return iter(self.items)
@@ -0,0 +1,156 @@
+"""
+Password hashing off the request thread
+
+scrypt and pbkdf2 are deliberately CPU-bound, so hashing in the request
+thread lets a burst of logins or sign-ups pin every worker. The hasher runs
+them in a process pool sized to this server process's share of the machine
+and refuses work beyond a queue limit instead of letting requests pile up
+behind it.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from typing import Callable, Optional
+
+from flask import Flask, current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from app.utils.exceptions import ServiceUnavailableError
+
+
+def normalize_hash_method(method: str) -> str:
+    """Expand a Werkzeug method name to the full spec it records in hashes, e.g. 'scrypt' -> 'scrypt:32768:8:1'"""
+    name, *args = method.split(":")
+    if name == "scrypt":
+        defaults = ["32768", "8", "1"]
+    elif name == "pbkdf2":
+        defaults = ["sha256", str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ":".join([name] + args + defaults[len(args):])
+
+
+class _InlineExecutor(Executor):
+    """Runs every call in the calling thread, for tests and single-process tools"""
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def _start_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class HashingPool:
+    """A bounded executor for hashing calls, created lazily in each process that uses it"""
+
+    def __init__(
+        self,
+        kind: str = "process",
+        workers: int = 0,
+        queue_size: int = 0,
+        timeout: float = 10,
+        server_processes: int = 1
+    ):
+        self.kind = kind
+        # Every server process has its own pool, so by default they split the cores between them
+        self.workers = workers or max(1, (os.cpu_count() or 1) // max(1, server_processes))
+        # Calls running plus waiting; anything beyond is rejected rather than queued
+        self.queue_size = queue_size or self.workers * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._executor: Optional[Executor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        # A pool inherited through fork (e.g. a preloading server) has no workers
+        # in this process, so every pid starts its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    if self.kind == "process":
+                        # Not fork: this runs in a threaded server process, and a child
+                        # forked while another thread holds a lock (logging, imports)
+                        # can deadlock on it
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_start_context())
+                    elif self.kind == "thread":
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hasher")
+                    else:
+                        self._executor = _InlineExecutor()
+                    self._slots = threading.BoundedSemaphore(self.queue_size)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def run(self, fn: Callable, *args):
+        """
+        Run `fn(*args)` on the pool and wait for its result
+
+        Raises:
+            ServiceUnavailableError: If the queue is full or the call timed out
+        """
+        executor = self._get_executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise ServiceUnavailableError("Too many authentication requests, please retry shortly")
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise ServiceUnavailableError("Authentication is taking too long, please retry shortly")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pid = None
+
+
+class PasswordHasher:
+    """Flask extension hashing and verifying passwords with the configured parameters"""
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions["password_hasher"] = {
+            "method": normalize_hash_method(app.config.get("PASSWORD_HASH_METHOD", "scrypt")),
+            "salt_length": app.config.get("PASSWORD_SALT_LENGTH", 16),
+            "pool": HashingPool(
+                kind=app.config.get("PASSWORD_HASH_EXECUTOR", "process"),
+                workers=app.config.get("PASSWORD_HASH_WORKERS", 0),
+                queue_size=app.config.get("PASSWORD_HASH_QUEUE_SIZE", 0),
+                timeout=app.config.get("PASSWORD_HASH_TIMEOUT", 10),
+                server_processes=app.config.get("WEB_CONCURRENCY", 1),
+            ),
+        }
+
+    @property
+    def _state(self) -> dict:
+        return current_app.extensions["password_hasher"]
+
+    def hash(self, password: str) -> str:
+        state = self._state
+        return state["pool"].run(generate_password_hash, password, state["method"], state["salt_length"])
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._state["pool"].run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Whether a hash was made with other parameters than the configured ones"""
+        method = password_hash.split("$", 1)[0]
+        return method != self._state["method"]
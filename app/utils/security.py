@@ -2,9 +2,10 @@ import os
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
-from werkzeug.security import check_password_hash, generate_password_hash
 import re
 
+from app import password_hasher
+
 
 class SecurityUtils:
     """Utility class for security-related operations"""
@@ -37,13 +38,13 @@ class SecurityUtils:
     
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash a password using Werkzeug's secure hashing"""
-        return generate_password_hash(password)
+        """Hash a password with the configured parameters, on the hashing pool"""
+        return password_hasher.hash(password)
     
     @staticmethod
     def verify_password(password: str, password_hash: str) -> bool:
-        """Verify a password against its hash"""
-        return check_password_hash(password_hash, password)
+        """Verify a password against its hash, on the hashing pool"""
+        return password_hasher.verify(password_hash, password)
     
     @staticmethod
     def create_tokens(user_id: int, additional_claims: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
@@ -0,0 +1,119 @@
+"""
+Revoked token store
+
+Tokens are revoked by their `jti` until they would have expired anyway, so
+the store only ever holds live tokens. Every authenticated request checks it,
+hence the in-process set by default; the Redis store shares revocations
+between workers at the cost of a round trip. A logout recorded in one
+process is invisible to the others, so the in-process set is refused when
+WEB_CONCURRENCY runs several server processes.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import Flask, current_app
+
+from app.utils.cache import InMemoryRedis
+
+
+class MemoryBlocklist:
+    """Revoked jtis of this process, dropped once their token has expired"""
+
+    def __init__(self):
+        self._revoked: Dict[str, Optional[float]] = {}
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._purge()
+
+    def is_revoked(self, jti: str) -> bool:
+        # Unlocked read, this runs on every request: purging swaps in a new dict
+        # rather than deleting from the one being read
+        revoked = self._revoked
+        if jti not in revoked:
+            return False
+        expires_at = revoked[jti]
+        return expires_at is None or expires_at > time.time()
+
+    def _purge(self) -> None:
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._revoked = {
+            jti: expires_at for jti, expires_at in self._revoked.items()
+            if expires_at is None or expires_at > now
+        }
+        self._next_purge = now + 60
+
+
+class RedisBlocklist:
+    """Revoked jtis in Redis, shared by every worker and expired by Redis itself"""
+
+    def __init__(self, client, prefix: str = "bookstore:revoked:"):
+        self.client = client
+        self.prefix = prefix
+
+    def revoke(self, jti: str, expires_at: Optional[float] = None) -> None:
+        ttl = expires_at - time.time() if expires_at is not None else None
+        if ttl is not None and ttl <= 0:
+            return
+        self.client.set(self.prefix + jti, b"1", px=int(ttl * 1000) if ttl else None)
+
+    def is_revoked(self, jti: str) -> bool:
+        return self.client.get(self.prefix + jti) is not None
+
+
+def create_blocklist(config):
+    """Build the store selected by TOKEN_BLOCKLIST_BACKEND ('memory' or 'redis')"""
+    kind = config.get("TOKEN_BLOCKLIST_BACKEND", "memory")
+    if kind == "memory":
+        if int(config.get("WEB_CONCURRENCY", 1)) > 1:
+            raise RuntimeError(
+                "TOKEN_BLOCKLIST_BACKEND = 'memory' can't revoke tokens across "
+                f"{config['WEB_CONCURRENCY']} server processes, use 'redis'"
+            )
+        return MemoryBlocklist()
+    if kind == "redis":
+        url = config.get("TOKEN_BLOCKLIST_REDIS_URL") or config.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+        if url == "memory://":
+            client = InMemoryRedis()
+        else:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("TOKEN_BLOCKLIST_BACKEND = 'redis' requires the redis package")
+            client = redis.Redis.from_url(url)
+        return RedisBlocklist(client, prefix=config.get("CACHE_KEY_PREFIX", "bookstore:") + "revoked:")
+    raise ValueError(f"Unknown TOKEN_BLOCKLIST_BACKEND: {kind!r}")
+
+
+class TokenBlocklist:
+    """Flask extension recording revoked tokens of the current app"""
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        blocklist = create_blocklist(app.config)
+        if isinstance(blocklist, MemoryBlocklist) and not (app.debug or app.testing):
+            app.logger.warning(
+                "Revoked tokens are kept in process memory: they are lost on restart and "
+                "not seen by other processes, set TOKEN_BLOCKLIST_BACKEND = 'redis'"
+            )
+        app.extensions["token_blocklist"] = blocklist
+
+    def revoke(self, jwt_payload: dict) -> None:
+        """Revoke a decoded token until it expires, allowing for JWT_DECODE_LEEWAY"""
+        expires_at = jwt_payload.get("exp")
+        if expires_at is not None:
+            leeway = current_app.config.get("JWT_DECODE_LEEWAY", 0)
+            expires_at += leeway.total_seconds() if hasattr(leeway, "total_seconds") else leeway
+        current_app.extensions["token_blocklist"].revoke(jwt_payload["jti"], expires_at)
+
+    def is_revoked(self, jwt_payload: dict) -> bool:
+        return current_app.extensions["token_blocklist"].is_revoked(jwt_payload["jti"])
@@ -0,0 +1,275 @@
+"""
+Latency and queries-per-request of the book and user APIs, compared to a baseline.
+
+Seeds a catalogue, then drives GET /api/books, GET /api/books/<id>,
+POST /api/users/login and GET /api/users/profile, first sequentially through
+the Flask test client and then with concurrent HTTP clients against a
+threaded server (or a running one, with --url). Query counts come from the
+Server-Timing header. Results are compared to the baseline file and the exit
+status is 1 on a regression:
+
+    python -m benchmarks.bench_api --books 10000              # compare to benchmarks/baseline.json
+    python -m benchmarks.bench_api --books 10000 --save       # record a new baseline
+    python -m benchmarks.bench_api --url http://localhost:5000 --skip-client
+
+Latencies are only comparable on the same machine and database; the baseline
+records where it was taken and the comparison says when that differs.
+Queries-per-request do not depend on the machine, but they do depend on the
+run parameters (catalogue size, request counts), which change cache hit
+ratios, so a run with parameters other than the baseline's is not compared.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from werkzeug.serving import make_server
+
+from app import db
+from benchmarks.common import BenchmarkConfig, create_bench_app, latency_summary, seed_books
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+USERNAME, EMAIL, PASSWORD = "bench_user", "bench@example.com", "Bench!Passw0rd"
+QUERIES = re.compile(r'db;[^,]*desc="queries: (\d+)"')
+# Cache expiries add the odd query to cached scenarios; a real N+1 adds at least one per request
+QUERY_SLACK = 0.1
+
+
+class ApiBenchmarkConfig(BenchmarkConfig):
+    # Query counts are read from the Server-Timing header
+    SERVER_TIMING_ENABLED = True
+
+
+def scenarios(books: int) -> Dict[str, Callable[[random.Random], Tuple[str, str, Optional[dict]]]]:
+    """Request builders per scenario, returning (method, path, json body)"""
+    pages = max(1, books // 20)
+    return {
+        "book_list": lambda rng: ("GET", f"/api/books?page={rng.randint(1, min(pages, 50))}&per_page=20", None),
+        "book_detail": lambda rng: ("GET", f"/api/books/{rng.randint(1, books)}", None),
+        "login": lambda rng: ("POST", "/api/users/login", {"username": USERNAME, "password": PASSWORD}),
+        "profile": lambda rng: ("GET", "/api/users/profile", None),
+    }
+
+
+def query_count(server_timing: Optional[str]) -> Optional[int]:
+    match = QUERIES.search(server_timing or "")
+    return int(match.group(1)) if match else None
+
+
+def summarize(latencies: List[float], queries: List[int], errors: int, elapsed: Optional[float] = None) -> dict:
+    result = latency_summary(latencies)
+    result["errors"] = errors
+    if queries:
+        result["queries_per_request"] = round(sum(queries) / len(queries), 2)
+    if elapsed:
+        result["requests_per_sec"] = round(len(latencies) / elapsed, 1)
+    return result
+
+
+def sign_up(client) -> str:
+    response = client.post("/api/users/signUp", json={
+        "username": USERNAME, "email": EMAIL, "password": PASSWORD, "confirm_password": PASSWORD
+    })
+    if response.status_code != 201:
+        raise SystemExit(f"Could not create the benchmark user: {response.get_data(as_text=True)}")
+    return response.get_json()["access_token"]
+
+
+def run_client(app, token: str, books: int, requests: Dict[str, int], seed: int = 1) -> dict:
+    """Sequential requests through the Flask test client: no network, just the app"""
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    rng = random.Random(seed)
+    results = {}
+    for name, build in scenarios(books).items():
+        latencies, queries, errors = [], [], 0
+        for _ in range(requests[name]):
+            method, path, body = build(rng)
+            started = time.perf_counter()
+            response = client.open(path, method=method, json=body, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+            count = query_count(", ".join(response.headers.getlist("Server-Timing")))
+            if count is not None:
+                queries.append(count)
+        results[name] = summarize(latencies, queries, errors)
+    return results
+
+
+def run_http(url: str, token: str, books: int, concurrency: int, duration: float, seed: int = 1) -> dict:
+    """`concurrency` keep-alive clients per scenario, each sending requests for `duration` seconds"""
+    target = urlsplit(url)
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    results = {}
+
+    for name, build in scenarios(books).items():
+        latencies, queries, errors = [], [], [0]
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def client_loop(worker: int):
+            rng = random.Random(seed * 1000 + worker)
+            connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+            mine, my_queries, my_errors = [], [], 0
+            while time.perf_counter() < deadline:
+                method, path, body = build(rng)
+                started = time.perf_counter()
+                try:
+                    connection.request(method, path, body=json.dumps(body) if body else None, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    my_errors += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                    continue
+                mine.append(time.perf_counter() - started)
+                my_errors += response.status >= 400
+                count = query_count(response.getheader("Server-Timing"))
+                if count is not None:
+                    my_queries.append(count)
+            connection.close()
+            with lock:
+                latencies.extend(mine)
+                queries.extend(my_queries)
+                errors[0] += my_errors
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results[name] = summarize(latencies, queries, errors[0], time.perf_counter() - started)
+    return results
+
+
+def machine() -> dict:
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "database": BenchmarkConfig.SQLALCHEMY_DATABASE_URI.split(":", 1)[0],
+    }
+
+
+def parameter_mismatch(results: dict, baseline: dict) -> List[str]:
+    """Run parameters that differ from the baseline's, as "name: baseline -> run" """
+    current, previous = results["parameters"], baseline.get("parameters", {})
+    return [
+        f"{name}: {previous.get(name)} -> {value}"
+        for name, value in current.items() if previous.get(name) != value
+    ]
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of `results` against `baseline`: p95/p99 beyond tolerance, or more queries per request"""
+    regressions = []
+    if baseline.get("machine") != results["machine"]:
+        print("Note: the baseline was recorded on a different machine or database; "
+              "latency comparisons are indicative only", file=sys.stderr)
+
+    for mode in ("client", "http"):
+        for scenario, current in results.get(mode, {}).items():
+            previous = baseline.get(mode, {}).get(scenario)
+            if not previous:
+                continue
+            for metric in ("p95_ms", "p99_ms"):
+                if metric in previous and current.get(metric, 0) > previous[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{mode}/{scenario} {metric}: {previous[metric]} -> {current[metric]}"
+                    )
+            if current.get("queries_per_request", 0) > previous.get("queries_per_request", float("inf")) + QUERY_SLACK:
+                regressions.append(
+                    f"{mode}/{scenario} queries_per_request: "
+                    f"{previous['queries_per_request']} -> {current['queries_per_request']}"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=10_000, help="Size of the seeded catalogue")
+    parser.add_argument("--requests", type=int, default=500, help="Test client requests per book/profile scenario")
+    parser.add_argument("--login-requests", type=int, default=50, help="Test client logins (password hashing is slow)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent HTTP clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of HTTP load per scenario")
+    parser.add_argument("--url", help="Load test a running server seeded with the same dataset instead")
+    parser.add_argument("--skip-client", action="store_true")
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95/p99 slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    app = create_bench_app(ApiBenchmarkConfig)
+    with app.app_context():
+        seed_books(args.books)
+    token = sign_up(app.test_client())
+    results = {
+        "parameters": {
+            "books": args.books,
+            "requests": args.requests,
+            "login_requests": args.login_requests,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+        },
+        "machine": machine(),
+    }
+
+    if not args.skip_client:
+        requests = {"book_list": args.requests, "book_detail": args.requests,
+                    "login": args.login_requests, "profile": args.requests}
+        results["client"] = run_client(app, token, args.books, requests)
+
+    if not args.skip_http:
+        server = None
+        url = args.url
+        if not url:
+            server = make_server("127.0.0.1", 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            results["http"] = run_http(url, token, args.books, args.concurrency, args.duration)
+        finally:
+            if server:
+                server.shutdown()
+
+    with app.app_context():
+        db.engine.dispose()
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        mismatch = parameter_mismatch(results, baseline)
+        if mismatch:
+            print("Not compared: the baseline was recorded with other parameters "
+                  f"({'; '.join(mismatch)}), re-run with the same ones or --save", file=sys.stderr)
+            sys.exit(2)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare in-Python filtering of the whole catalogue with the indexed SQL lookups
+behind BookService.get_books_by_author / get_books_by_category / search_books.
+
+    python -m benchmarks.bench_book_lookups --sizes 100000 1000000
+"""
+import argparse
+import json
+
+from app.repositories.book_repository import BookRepository
+from app.services.book_service import BookService
+from benchmarks.common import AUTHORS, CATEGORIES, create_bench_app, measure, seed_books
+
+
+def python_filtering(repository: BookRepository, author: str, category: str, term: str) -> None:
+    """The previous implementation: load every book, filter in Python"""
+    [book for book in repository.list_all() if book.author == author]
+    [book for book in repository.list_all() if book.category == category]
+    term = term.lower()
+    [
+        book for book in repository.list_all()
+        if term in book.title.lower() or
+           (book.description and term in book.description.lower()) or
+           term in book.author.lower() or
+           term in book.category.lower()
+    ]
+
+
+def run(size: int, skip_python: bool) -> dict:
+    app = create_bench_app()
+    service = BookService()
+    author, category, term = AUTHORS[7], CATEGORIES[3], "dragon"
+    results = {}
+
+    with app.app_context():
+        seed_books(size)
+
+        if not skip_python:
+            with measure(results, "python_filtering"):
+                python_filtering(service.book_repository, author, category, term)
+
+        with measure(results, "sql_full_results"):
+            service.get_books_by_author(author)
+            service.get_books_by_category(category)
+            service.search_books(term)
+
+        with measure(results, "sql_first_page"):
+            service.get_books_by_author(author, page=1)
+            service.get_books_by_category(category, page=1)
+            service.search_books(term, page=1)
+
+        with measure(results, "sql_streamed"):
+            for _ in service.iter_books(category=category):
+                pass
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--skip-python", action="store_true", help="Skip the slow load-everything baseline")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(json.dumps({"books": size, **run(size, args.skip_python)}))
+
+
+if __name__ == "__main__":
+    main()
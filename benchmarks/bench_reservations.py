@@ -0,0 +1,118 @@
+"""
+Stock reservations under concurrent contention: the read-modify-write
+pattern of PATCH /api/books/<id> (read stock, subtract in Python, write it
+back) against BookService.reserve_stock (one conditional UPDATE).
+
+Every thread keeps reserving one copy of a few hot books until their stock
+runs out. A correct implementation sells exactly the initial stock; lost
+updates show up as more successful reservations than copies taken off the
+stock, overselling as stock below zero.
+
+    python -m benchmarks.bench_reservations --threads 8 --stock 500
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models.book import Book
+from app.services.book_service import book_service
+from benchmarks.common import book_rows, create_bench_app
+
+
+def read_modify_write(book_id: int) -> bool:
+    book = db.session.get(Book, book_id, populate_existing=True)
+    if book.stock < 1:
+        db.session.rollback()
+        return False
+    stock = book.stock - 1
+    # Plain UPDATE of the value computed from the earlier read, as PATCH sends it
+    db.session.execute(
+        update(Book).where(Book.id == book_id).values(stock=stock).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return True
+
+
+def conditional_update(book_id: int) -> bool:
+    reservation, = book_service.reserve_stock([(book_id, 1)])
+    return reservation.reserved
+
+
+def run_strategy(app, reserve, hot_books: int, stock: int, threads: int) -> dict:
+    with app.app_context():
+        db.session.execute(update(Book).where(Book.id <= hot_books).values(stock=stock))
+        db.session.commit()
+
+    lock = threading.Lock()
+    totals = {"reserved": 0, "rejected": 0, "errors": 0}
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        reserved = rejected = errors = 0
+        sold_out = set()
+        with app.app_context():
+            while len(sold_out) < hot_books:
+                book_id = rng.randint(1, hot_books)
+                try:
+                    if reserve(book_id):
+                        reserved += 1
+                    else:
+                        rejected += 1
+                        sold_out.add(book_id)
+                except OperationalError:
+                    # e.g. SQLite "database is locked" or a MySQL deadlock
+                    db.session.rollback()
+                    errors += 1
+            db.session.remove()
+        with lock:
+            totals["reserved"] += reserved
+            totals["rejected"] += rejected
+            totals["errors"] += errors
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        remaining = db.session.query(db.func.sum(Book.stock)).filter(Book.id <= hot_books).scalar()
+        negative = db.session.query(db.func.count()).filter(Book.id <= hot_books, Book.stock < 0).scalar()
+    taken = hot_books * stock - remaining
+    return {
+        **totals,
+        "reservations_per_sec": round(totals["reserved"] / elapsed, 1),
+        "stock_taken": taken,
+        "lost_updates": totals["reserved"] - taken,
+        "books_below_zero": negative,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--hot-books", type=int, default=3, help="Books all threads compete for")
+    parser.add_argument("--stock", type=int, default=500, help="Initial stock of each hot book")
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        db.session.execute(db.insert(Book), list(book_rows(args.hot_books)))
+        db.session.commit()
+
+    results = {"threads": args.threads, "hot_books": args.hot_books, "stock": args.stock}
+    for name, reserve in (("read_modify_write", read_modify_write), ("conditional_update", conditional_update)):
+        results[name] = run_strategy(app, reserve, args.hot_books, args.stock, args.threads)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
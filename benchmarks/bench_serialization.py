@@ -0,0 +1,60 @@
+"""
+Microbenchmark of the book list serialization paths: Marshmallow dump
+followed by Flask-RESTX marshal_with and json (the previous behaviour),
+against the precompiled row serializer encoded with json or orjson.
+
+    python -m benchmarks.bench_serialization --books 100 --rounds 2000
+"""
+import argparse
+import json
+import timeit
+
+import orjson
+from flask_restx import marshal
+
+from app.controllers.book_controller import book_list_model
+from app.models.book import Book
+from app.schemas.book_schemas import BookResponseSchema
+from app.schemas.row_serializers import book_serializer
+from benchmarks.common import book_rows, create_bench_app
+
+
+def run(count: int, rounds: int) -> dict:
+    app = create_bench_app()
+    books = [Book(id=i + 1, **row) for i, row in enumerate(book_rows(count))]
+    pagination = {"page": 1, "per_page": count, "total": count, "pages": 1,
+                  "has_next": False, "has_prev": False, "next_num": None, "prev_num": None}
+    serializer = book_serializer()
+
+    def marshmallow_and_marshal():
+        payload = {"books": BookResponseSchema(many=True).dump(books), "pagination": pagination}
+        return json.dumps(marshal(payload, book_list_model))
+
+    def precompiled_json():
+        return json.dumps({"books": serializer.dump_many(books), "pagination": pagination}, default=str)
+
+    def precompiled_orjson():
+        return orjson.dumps({"books": serializer.dump_many(books), "pagination": pagination})
+
+    results = {}
+    with app.app_context():
+        for name, function in [
+            ("marshmallow_and_marshal", marshmallow_and_marshal),
+            ("precompiled_json", precompiled_json),
+            ("precompiled_orjson", precompiled_orjson),
+        ]:
+            seconds = min(timeit.repeat(function, number=rounds, repeat=3))
+            results[name] = {"us_per_response": round(seconds / rounds * 1e6, 1)}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=100, help="Books per response")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps({"books": args.books, **run(args.books, args.rounds)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare book writes per second with the previous read-back pattern
+(add + commit + refresh, get + mutate + commit + refresh) against the
+repository write path (INSERT, UPDATE ... RETURNING).
+
+    python -m benchmarks.bench_writes --writes 5000
+"""
+import argparse
+import json
+import time
+
+from app import db
+from app.models.book import Book
+from app.repositories.book_repository import BookRepository
+from benchmarks.common import book_rows, create_bench_app
+
+
+def timed(results: dict, name: str, count: int, operation) -> None:
+    started = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    elapsed = time.perf_counter() - started
+    results[name] = {"writes_per_sec": round(count / elapsed, 1)}
+
+
+def run(writes: int) -> dict:
+    app = create_bench_app()
+    repository = BookRepository()
+    rows = list(book_rows(writes))
+    results = {}
+
+    with app.app_context():
+        def insert_with_refresh(i):
+            book = Book(**rows[i])
+            db.session.add(book)
+            db.session.commit()
+            db.session.refresh(book)
+
+        def update_with_refresh(i):
+            book = db.session.get(Book, i + 1)
+            book.stock = i
+            db.session.commit()
+            db.session.refresh(book)
+            db.session.expunge_all()
+
+        timed(results, "insert_before", writes, insert_with_refresh)
+        timed(results, "update_before", writes, update_with_refresh)
+
+        db.session.execute(db.delete(Book))
+        db.session.commit()
+        db.session.expunge_all()
+
+        timed(results, "insert_after", writes, lambda i: repository.add(Book(**rows[i])))
+        first_id = db.session.query(db.func.min(Book.id)).scalar()
+        db.session.expunge_all()
+
+        def update_by_id(i):
+            repository.update_by_id(first_id + i, {"stock": i})
+            db.session.expunge_all()
+
+        timed(results, "update_after", writes, update_by_id)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=5000)
+    args = parser.parse_args()
+    print(json.dumps({"writes": args.writes, **run(args.writes)}))
+
+
+if __name__ == "__main__":
+    main()
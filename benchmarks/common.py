@@ -0,0 +1,108 @@
+"""
+Shared helpers for the benchmark scripts
+
+Benchmarks run against a throwaway SQLite file by default; set
+BENCH_DATABASE_URL to point them at a MySQL database instead.
+"""
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Iterator, List
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.models.book import Book
+from config import BaseConfig
+
+
+AUTHORS = [f"Author {i}" for i in range(500)]
+CATEGORIES = ["Fiction", "Science", "History", "Poetry", "Horror", "Fantasy", "Biography", "Travel"]
+WORDS = ["dragon", "river", "empire", "garden", "night", "shadow", "winter", "ocean", "crown", "machine"]
+
+
+class BenchmarkConfig(BaseConfig):
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        "BENCH_DATABASE_URL",
+        f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bookstore_bench.db')}"
+    )
+    DEBUG = False
+    TESTING = True
+
+
+def create_bench_app(config=BenchmarkConfig):
+    """Create the app with a freshly created, empty schema"""
+    app = create_app(config)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def book_rows(count: int, seed: int = 42) -> Iterator[dict]:
+    rng = random.Random(seed)
+    start = date(1950, 1, 1)
+    for i in range(count):
+        words = rng.sample(WORDS, 3)
+        yield {
+            "title": f"The {words[0].title()} {words[1].title()} {i}",
+            "description": f"A story about the {words[0]}, the {words[1]} and the {words[2]}. " * 5,
+            "release_date": start + timedelta(days=rng.randrange(25000)),
+            "price": round(rng.uniform(1, 100), 2),
+            "author": rng.choice(AUTHORS),
+            "category": rng.choice(CATEGORIES),
+            "stock": rng.randrange(0, 500),
+            "creator": "bench",
+        }
+
+
+def seed_books(count: int, chunk_size: int = 10000) -> None:
+    """Insert `count` generated books with executemany in chunks (needs an app context)"""
+    chunk = []
+    for row in book_rows(count):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            db.session.execute(insert(Book), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(insert(Book), chunk)
+    db.session.commit()
+
+
+@contextmanager
+def measure(results: dict, name: str):
+    """Record wall time (ms) and peak traced memory (MiB) of the block into results[name]"""
+    db.session.expunge_all()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.session.expunge_all()
+        results[name] = {"ms": round(elapsed * 1000, 2), "peak_mib": round(peak / 2 ** 20, 2)}
+
+
+def latency_summary(latencies: List[float]) -> dict:
+    """p50/p95/p99 and mean (ms) of request latencies given in seconds, by nearest rank"""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"requests": 0}
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)] * 1000, 2)
+
+    return {
+        "requests": len(ordered),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
@@ -0,0 +1,49 @@
+"""
+Gunicorn settings for production
+
+    gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden from the environment, see README.md.
+Graceful reload: `kill -HUP <master pid>` starts fresh workers with the same
+code and config and lets the old ones finish their requests. With
+preload_app the code is loaded once in the master, so deploying new code
+needs `kill -USR2` (start a new master) followed by `kill -TERM` of the old one.
+"""
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Requests mostly wait on the database, so every core gets two workers plus one
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# The app sizes per-process resources (password hashing pool) from it
+os.environ["WEB_CONCURRENCY"] = str(workers)
+# 'gthread' (threads per worker) or 'gevent' (requires the gevent package)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))  # gevent only
+
+# Build the app once in the master; workers fork from it and share its memory pages
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Recycle workers now and then to bound memory growth, staggered so they don't restart together
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master; sharing a socket between processes corrupts it"""
+    from app import db
+    from wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -90,11 +90,23 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    connectable = get_engine()
+
+    # full-text search is dialect specific: the SQLite FTS5 table and its shadow
+    # tables are created with raw DDL, and the FULLTEXT index only exists on
+    # MySQL, so keep autogenerate from proposing to drop or add them
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and reflected and compare_to is None:
+            return not name.startswith('books_fts')
+        if type_ == 'index' and name == 'ft_books_search':
+            return connectable.dialect.name in ('mysql', 'mariadb')
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
-
-    connectable = get_engine()
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     with connectable.connect() as connection:
         context.configure(
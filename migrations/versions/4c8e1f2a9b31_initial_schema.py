@@ -0,0 +1,74 @@
+"""initial schema
+
+Revision ID: 4c8e1f2a9b31
+Revises: 
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8e1f2a9b31'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('books',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('release_date', sa.Date(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('author', sa.String(length=200), nullable=False),
+    sa.Column('category', sa.String(length=100), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.Column('creator', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index('idx_author_category', ['author', 'category'], unique=False)
+        batch_op.create_index('idx_category_price_date', ['category', 'price', 'release_date'], unique=False)
+        batch_op.create_index('idx_price_date', ['price', 'release_date'], unique=False)
+        batch_op.create_index(batch_op.f('ix_books_author'), ['author'], unique=False)
+        batch_op.create_index(batch_op.f('ix_books_category'), ['category'], unique=False)
+        batch_op.create_index(batch_op.f('ix_books_price'), ['price'], unique=False)
+        batch_op.create_index(batch_op.f('ix_books_release_date'), ['release_date'], unique=False)
+        batch_op.create_index(batch_op.f('ix_books_title'), ['title'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=256), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('is_admin', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_username'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_books_title'))
+        batch_op.drop_index(batch_op.f('ix_books_release_date'))
+        batch_op.drop_index(batch_op.f('ix_books_price'))
+        batch_op.drop_index(batch_op.f('ix_books_category'))
+        batch_op.drop_index(batch_op.f('ix_books_author'))
+        batch_op.drop_index('idx_price_date')
+        batch_op.drop_index('idx_category_price_date')
+        batch_op.drop_index('idx_author_category')
+
+    op.drop_table('books')
@@ -0,0 +1,64 @@
+"""books full-text search
+
+Revision ID: 7d2b9e4f6a10
+Revises: 4c8e1f2a9b31
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2b9e4f6a10'
+down_revision = '4c8e1f2a9b31'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+    "title, description, author, category, "
+    "content='books', content_rowid='id', prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, description, author, category) "
+    "VALUES (new.id, new.title, new.description, new.author, new.category); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, description, author, category) "
+    "VALUES ('delete', old.id, old.title, old.description, old.author, old.category); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, description, author, category ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, description, author, category) "
+    "VALUES ('delete', old.id, old.title, old.description, old.author, old.category); "
+    "INSERT INTO books_fts(rowid, title, description, author, category) "
+    "VALUES (new.id, new.title, new.description, new.author, new.category); END",
+    # Index the rows that already exist
+    "INSERT INTO books_fts(books_fts) VALUES ('rebuild')",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS books_fts_au",
+    "DROP TRIGGER IF EXISTS books_fts_ad",
+    "DROP TRIGGER IF EXISTS books_fts_ai",
+    "DROP TABLE IF EXISTS books_fts",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif dialect in ('mysql', 'mariadb'):
+        op.create_index(
+            'ft_books_search', 'books', ['title', 'description', 'author', 'category'],
+            unique=False, mysql_prefix='FULLTEXT'
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif dialect in ('mysql', 'mariadb'):
+        op.drop_index('ft_books_search', table_name='books')
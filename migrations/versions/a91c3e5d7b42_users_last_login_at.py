@@ -0,0 +1,26 @@
+"""users last_login_at
+
+Revision ID: a91c3e5d7b42
+Revises: 7d2b9e4f6a10
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91c3e5d7b42'
+down_revision = '7d2b9e4f6a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_login_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('last_login_at')
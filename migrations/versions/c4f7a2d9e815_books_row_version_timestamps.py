@@ -0,0 +1,60 @@
+"""books row_version and timestamps
+
+Revision ID: c4f7a2d9e815
+Revises: a91c3e5d7b42
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f7a2d9e815'
+down_revision = 'a91c3e5d7b42'
+branch_labels = None
+depends_on = None
+
+
+# Tightening the timestamps rebuilds the table on SQLite, which drops the
+# full-text search triggers. They are created again, with books_fts_au limited
+# to the indexed columns for databases that still have the older trigger.
+SQLITE_FTS_TRIGGERS = (
+    "DROP TRIGGER IF EXISTS books_fts_ai",
+    "DROP TRIGGER IF EXISTS books_fts_ad",
+    "DROP TRIGGER IF EXISTS books_fts_au",
+    "CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, description, author, category) "
+    "VALUES (new.id, new.title, new.description, new.author, new.category); END",
+    "CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, description, author, category) "
+    "VALUES ('delete', old.id, old.title, old.description, old.author, old.category); END",
+    "CREATE TRIGGER books_fts_au AFTER UPDATE OF title, description, author, category ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, description, author, category) "
+    "VALUES ('delete', old.id, old.title, old.description, old.author, old.category); "
+    "INSERT INTO books_fts(rowid, title, description, author, category) "
+    "VALUES (new.id, new.title, new.description, new.author, new.category); END",
+)
+
+
+def upgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('row_version', sa.Integer(), server_default='1', nullable=False))
+
+    op.execute("UPDATE books SET created_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP")
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_FTS_TRIGGERS:
+            op.execute(statement)
+
+
+def downgrade():
+    # Plain ALTER TABLE ... DROP COLUMN (SQLite 3.35+) rather than a batch rebuild, which would drop the triggers
+    for column in ('row_version', 'updated_at', 'created_at'):
+        op.drop_column('books', column)
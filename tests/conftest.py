@@ -0,0 +1,72 @@
+import pytest
+
+from app import create_app, db
+from app.models.book import Book
+
+
+class TestConfig:
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    TESTING = True
+    JWT_SECRET_KEY = "test-secret-key-that-is-long-enough-for-hs256"
+    PASSWORD_HASH_EXECUTOR = "inline"
+    LOGIN_FLUSH_INTERVAL = 0
+    TOKEN_BLOCKLIST_BACKEND = "memory"
+
+
+@pytest.fixture
+def config():
+    return TestConfig
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def tokens(client):
+    """Access and refresh token of a freshly signed up user"""
+    response = client.post('/api/users/signUp', json={
+        'username': 'alice',
+        'email': 'alice@example.com',
+        'password': 'Passw0rd!',
+        'confirm_password': 'Passw0rd!',
+    })
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return response.get_json()
+
+
+@pytest.fixture
+def auth(tokens):
+    return {'Authorization': f"Bearer {tokens['access_token']}"}
+
+
+@pytest.fixture
+def add_books(app):
+    """Insert books with the given stocks (or field overrides), returning their ids"""
+    def add_books(*books):
+        rows = [book if isinstance(book, dict) else {'stock': book} for book in books]
+        with app.app_context():
+            created = [
+                Book(**{
+                    'title': f'Book {i}', 'author': 'Author', 'category': 'Fiction',
+                    'price': 10.0, 'stock': 10, 'creator': 'alice', **row,
+                })
+                for i, row in enumerate(rows)
+            ]
+            db.session.add_all(created)
+            db.session.commit()
+            return [book.id for book in created]
+    return add_books
@@ -0,0 +1,59 @@
+import pytest
+
+from app.utils.pagination import encode_cursor
+
+
+def walk(client, auth, **params):
+    """Follow next_cursor from the first page to the last, returning the ids in the order served"""
+    ids, cursor = [], None
+    while True:
+        query = {'pagination': 'cursor', 'per_page': 2, **params}
+        if cursor:
+            query['cursor'] = cursor
+        response = client.get('/api/books', headers=auth, query_string=query)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        ids += [book['id'] for book in body['books']]
+        cursor = body['pagination']['next_cursor']
+        if cursor is None:
+            return ids
+
+
+@pytest.fixture
+def titles(add_books):
+    # Repeated titles make the id tie-break matter
+    names = ['b', 'a', 'c', 'a', 'b']
+    ids = add_books(*[{'title': name} for name in names])
+    return dict(zip(ids, names))
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_cursor_walks_every_book_once_by_id(client, auth, titles, order):
+    assert walk(client, auth, order=order) == sorted(titles, reverse=order == 'desc')
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_cursor_walks_every_book_once_by_title(client, auth, titles, order):
+    expected = sorted(titles, key=lambda book_id: (titles[book_id], book_id), reverse=order == 'desc')
+    assert walk(client, auth, sort='title', order=order) == expected
+
+
+def test_cursor_for_another_sort_is_rejected(client, auth, titles):
+    first = client.get('/api/books', headers=auth, query_string={'pagination': 'cursor', 'per_page': 2, 'sort': 'title'})
+    cursor = first.get_json()['pagination']['next_cursor']
+
+    response = client.get('/api/books', headers=auth, query_string={'cursor': cursor, 'sort': 'author'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Cursor does not match the requested sort order'}
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    encode_cursor('title', 'asc', 5, 1),       # sort value of the wrong type
+    encode_cursor('title', 'asc', 'a', '1'),   # id that is not an integer
+    encode_cursor('title', 'asc', 'a', True),
+])
+def test_tampered_cursor_is_rejected(client, auth, titles, cursor):
+    response = client.get('/api/books', headers=auth, query_string={'cursor': cursor, 'sort': 'title'})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,140 @@
+import threading
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models.book import Book
+from app.services.book_service import book_service
+from tests.conftest import TestConfig
+
+
+def stock(app, book_id):
+    with app.app_context():
+        return db.session.get(Book, book_id).stock
+
+
+def test_reserve_takes_stock(app, client, auth, add_books):
+    book_id, = add_books(5)
+    response = client.post(f'/api/books/{book_id}/reserve', headers=auth, json={'quantity': 3})
+    assert response.status_code == 200
+    assert response.get_json()['stock'] == 2
+    assert stock(app, book_id) == 2
+
+
+def test_reserve_never_goes_below_zero(app, client, auth, add_books):
+    book_id, = add_books(2)
+    response = client.post(f'/api/books/{book_id}/reserve', headers=auth, json={'quantity': 3})
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Insufficient stock'
+    assert stock(app, book_id) == 2
+
+
+def test_reserve_unknown_book(client, auth):
+    response = client.post('/api/books/999/reserve', headers=auth, json={'quantity': 1})
+    assert response.status_code == 404
+    assert response.get_json()['error'] == 'Book not found'
+
+
+def test_batch_reports_each_item(app, client, auth, add_books):
+    first, second = add_books(5, 1)
+    response = client.post('/api/books/reserve', headers=auth, json={'items': [
+        {'book_id': first, 'quantity': 2},
+        {'book_id': second, 'quantity': 2},
+        {'book_id': 999},
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['reserved'], body['failed']) == (1, 2)
+    assert [(result['reserved'], result['stock'], result['error']) for result in body['results']] == [
+        (True, 3, None),
+        (False, 1, 'Insufficient stock'),
+        (False, None, 'Book not found'),
+    ]
+    assert (stock(app, first), stock(app, second)) == (3, 1)
+
+
+def test_batch_all_or_nothing_rolls_back(app, client, auth, add_books):
+    first, second = add_books(5, 1)
+    response = client.post('/api/books/reserve', headers=auth, json={'all_or_nothing': True, 'items': [
+        {'book_id': first, 'quantity': 2},
+        {'book_id': second, 'quantity': 2},
+    ]})
+    assert response.status_code == 409
+    results = response.get_json()['results']
+    assert [(result['reserved'], result['stock']) for result in results] == [(False, 5), (False, 1)]
+    assert results[0]['error'] == 'Not reserved because another item failed'
+    assert (stock(app, first), stock(app, second)) == (5, 1)
+
+
+def test_batch_updates_rows_in_id_order(app, add_books):
+    ids = add_books(5, 5, 5)
+    updated = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('UPDATE BOOKS'):
+            updated.append(context.compiled_parameters[0]['id_1'])
+
+    with app.app_context():
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            reservations = book_service.reserve_stock([(ids[2], 1), (ids[0], 1), (ids[1], 1)])
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    assert updated == sorted(ids)
+    # Results still come back in request order
+    assert [reservation.book_id for reservation in reservations] == [ids[2], ids[0], ids[1]]
+
+
+def test_batch_rejects_bad_quantities(client, auth, add_books):
+    book_id, = add_books(5)
+    response = client.post('/api/books/reserve', headers=auth, json={'items': [{'book_id': book_id, 'quantity': 0}]})
+    assert response.status_code == 400
+    assert client.post('/api/books/reserve', headers=auth, json={'items': []}).status_code == 400
+
+
+class FileConfig(TestConfig):
+    SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+
+@pytest.fixture
+def config(tmp_path):
+    # Threads need connections of their own, which an in-memory database can't give them
+    class Config(FileConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'books.db'}"
+    return Config
+
+
+def test_concurrent_reservations_do_not_oversell(app, add_books):
+    book_id, = add_books(50)
+    reserved = []
+    lock = threading.Lock()
+
+    def worker():
+        count = 0
+        with app.app_context():
+            while True:
+                try:
+                    reservation, = book_service.reserve_stock([(book_id, 1)])
+                except OperationalError:
+                    # SQLite "database is locked": the reservation did not happen, try again
+                    db.session.rollback()
+                    continue
+                if not reservation.reserved:
+                    break
+                count += 1
+            db.session.remove()
+        with lock:
+            reserved.append(count)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(reserved) == 50
+    assert stock(app, book_id) == 0
@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy.dialects import mysql
+
+from app.models.book import Book
+from app.repositories.book_search import MySqlFulltextBookSearch, _search_terms
+
+
+@pytest.fixture
+def books(add_books):
+    titles = ['The Great Gatsby', 'Gatsby Notes', 'Great Expectations', 'Other Stories']
+    ids = add_books(*[{'title': title, 'author': 'Author'} for title in titles])
+    return dict(zip(titles, ids))
+
+
+def search(client, auth, text):
+    response = client.get('/api/books', headers=auth, query_string={'search': text, 'per_page': 100})
+    assert response.status_code == 200, response.get_json()
+    return sorted(book['title'] for book in response.get_json()['books'])
+
+
+def test_every_term_must_match(client, auth, books):
+    assert search(client, auth, 'great gatsby') == ['The Great Gatsby']
+    assert search(client, auth, 'great') == ['Great Expectations', 'The Great Gatsby']
+
+
+def test_stopwords_are_ignored(client, auth, books):
+    assert search(client, auth, 'the gatsby') == ['Gatsby Notes', 'The Great Gatsby']
+    assert search(client, auth, 'Gatsby, of the') == ['Gatsby Notes', 'The Great Gatsby']
+
+
+def test_terms_match_word_prefixes_only(client, auth, books):
+    assert search(client, auth, 'gats') == ['Gatsby Notes', 'The Great Gatsby']
+    assert search(client, auth, 'atsby') == []
+
+
+def test_only_stopwords_falls_back_to_substring_search(client, auth, books):
+    # "the" as a substring: "The Great Gatsby" and "Other Stories"
+    assert search(client, auth, 'the') == ['Other Stories', 'The Great Gatsby']
+
+
+def test_search_terms():
+    assert _search_terms('The "Great" Gatsby*') == ['Great', 'Gatsby']
+    assert _search_terms('C# in a nutshell', min_length=3) == ['nutshell']
+    assert _search_terms('the of') == []
+
+
+def test_mysql_query_requires_each_remaining_term_as_a_prefix(app):
+    with app.app_context():
+        query = MySqlFulltextBookSearch().apply(Book.query, 'the great gatsby')
+        compiled = query.statement.compile(dialect=mysql.dialect())
+    assert 'IN BOOLEAN MODE' in str(compiled)
+    assert '+great* +gatsby*' in compiled.params.values()
@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+
+from app.services.book_service import book_service
+
+
+def test_patch_and_get_serialize_alike(client, auth, add_books):
+    book_id, = add_books({'price': 10.0})
+    patched = client.patch(f'/api/books/{book_id}', headers=auth, json={'price': 12, 'stock': 3})
+    assert patched.status_code == 200
+
+    fetched = client.get(f'/api/books/{book_id}', headers=auth)
+    body = patched.get_json()
+    assert body == fetched.get_json()
+    assert isinstance(body['price'], float)
+
+
+def test_bulk_create_hides_database_errors(app):
+    rows = [
+        {'title': 'Kept', 'author': 'Author', 'category': 'Fiction'},
+        {'title': None, 'author': 'Author', 'category': 'Fiction'},
+    ]
+    with app.app_context():
+        errors = book_service.bulk_create_books(rows)
+    assert errors == [(1, 'Row violates a database constraint')]
+
+
+def test_export_has_the_response_fields(client, auth, add_books):
+    book_id, = add_books({'price': 10.0})
+    book = client.get(f'/api/books/{book_id}', headers=auth).get_json()
+
+    ndjson = client.get('/api/books/export', headers=auth, query_string={'format': 'ndjson'})
+    assert json.loads(ndjson.get_data(as_text=True).splitlines()[0]) == book
+
+    exported = client.get('/api/books/export', headers=auth, query_string={'format': 'csv'})
+    row, = csv.DictReader(io.StringIO(exported.get_data(as_text=True)))
+    assert row.keys() == book.keys()
+    assert (row['created_at'], row['updated_at']) == (book['created_at'], book['updated_at'])
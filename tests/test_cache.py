@@ -0,0 +1,16 @@
+import pytest
+
+from app.utils.cache import MemoryCache, RedisCache, create_backend
+
+
+def test_memory_backend_refused_with_several_processes():
+    with pytest.raises(RuntimeError):
+        create_backend({'CACHE_BACKEND': 'memory', 'WEB_CONCURRENCY': 4})
+    assert isinstance(create_backend({'CACHE_BACKEND': 'memory', 'WEB_CONCURRENCY': 1}), MemoryCache)
+
+
+def test_redis_backend_with_in_process_stand_in():
+    backend = create_backend({'CACHE_BACKEND': 'redis', 'CACHE_REDIS_URL': 'memory://', 'WEB_CONCURRENCY': 4})
+    assert isinstance(backend, RedisCache)
+    backend.set('key', {'a': 1})
+    assert backend.get('key') == {'a': 1}
@@ -0,0 +1,85 @@
+import time
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_refresh_token, decode_token
+
+from app.utils.cache import InMemoryRedis
+from app.utils.token_blocklist import MemoryBlocklist, RedisBlocklist, create_blocklist
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.mark.parametrize('make_blocklist', [MemoryBlocklist, lambda: RedisBlocklist(InMemoryRedis())])
+def test_revoke_until_expiry(make_blocklist):
+    blocklist = make_blocklist()
+    blocklist.revoke('live', time.time() + 60)
+    blocklist.revoke('expired', time.time() - 1)
+
+    assert blocklist.is_revoked('live')
+    assert not blocklist.is_revoked('expired')
+    assert not blocklist.is_revoked('unknown')
+
+
+def test_memory_blocklist_without_expiry():
+    blocklist = MemoryBlocklist()
+    blocklist.revoke('forever')
+    assert blocklist.is_revoked('forever')
+
+
+def test_memory_blocklist_purges_expired_tokens():
+    blocklist = MemoryBlocklist()
+    blocklist.revoke('expired', time.time() - 1)
+    blocklist._next_purge = 0
+    blocklist.revoke('live', time.time() + 60)
+    assert set(blocklist._revoked) == {'live'}
+
+
+def test_memory_backend_refused_with_several_processes():
+    with pytest.raises(RuntimeError):
+        create_blocklist({'TOKEN_BLOCKLIST_BACKEND': 'memory', 'WEB_CONCURRENCY': 4})
+    assert isinstance(create_blocklist({'TOKEN_BLOCKLIST_BACKEND': 'memory', 'WEB_CONCURRENCY': 1}), MemoryBlocklist)
+
+
+def test_redis_backend_with_in_process_stand_in():
+    blocklist = create_blocklist({'TOKEN_BLOCKLIST_BACKEND': 'redis', 'TOKEN_BLOCKLIST_REDIS_URL': 'memory://'})
+    assert isinstance(blocklist, RedisBlocklist)
+
+
+def test_logout_revokes_access_token(client, tokens):
+    headers = bearer(tokens['access_token'])
+    assert client.get('/api/users/profile', headers=headers).status_code == 200
+
+    response = client.post('/api/users/logout', headers=headers)
+    assert response.status_code == 200
+    assert client.get('/api/users/profile', headers=headers).status_code == 401
+
+
+def test_logout_revokes_refresh_token(client, tokens):
+    response = client.post(
+        '/api/users/logout', headers=bearer(tokens['access_token']), json={'refresh_token': tokens['refresh_token']}
+    )
+    assert response.status_code == 200
+    assert client.post('/api/users/refresh', headers=bearer(tokens['refresh_token'])).status_code == 401
+
+
+def test_logout_with_expired_refresh_token(app, client, tokens):
+    with app.app_context():
+        user_id = decode_token(tokens['access_token'])['sub']
+        expired = create_refresh_token(identity=user_id, expires_delta=timedelta(seconds=-1))
+
+    headers = bearer(tokens['access_token'])
+    response = client.post('/api/users/logout', headers=headers, json={'refresh_token': expired})
+    assert response.status_code == 200
+    assert client.get('/api/users/profile', headers=headers).status_code == 401
+
+
+def test_logout_with_invalid_refresh_token_still_revokes_access_token(client, tokens):
+    headers = bearer(tokens['access_token'])
+    response = client.post('/api/users/logout', headers=headers, json={'refresh_token': 'not-a-token'})
+    assert response.status_code == 401
+    assert client.get('/api/users/profile', headers=headers).status_code == 401
+    # The refresh token that wasn't sent stays usable
+    assert client.post('/api/users/refresh', headers=bearer(tokens['refresh_token'])).status_code == 200
@@ -0,0 +1,21 @@
+from sqlalchemy import update
+
+from app import db
+from app.models.user import User
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_refresh_ignores_cached_profile_of_deactivated_user(app, client, tokens):
+    assert client.get('/api/users/profile', headers=bearer(tokens['access_token'])).status_code == 200
+
+    # As deactivate_user run from another process: this process's profile cache still has the user
+    with app.app_context():
+        db.session.execute(update(User).values(is_active=False))
+        db.session.commit()
+
+    response = client.post('/api/users/refresh', headers=bearer(tokens['refresh_token']))
+    assert response.status_code != 200
+    assert 'access_token' not in (response.get_json() or {})
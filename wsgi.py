@@ -0,0 +1,7 @@
+"""
+Production entry point: gunicorn imports `app` from here (see gunicorn.conf.py)
+"""
+from app import create_app
+from config import ProductionConfig
+
+app = create_app(ProductionConfig)